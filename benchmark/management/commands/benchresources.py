@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from benchmark.resource_manager import Benchmark
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+            make_option("--sessions", type=int, default=500,
+                help="number of simulated agent sessions (default: 500)"),
+            make_option("--devices", type=int, default=10,
+                help="devices reported by each session (default: 10)"),
+            make_option("--updates", type=int, default=10,
+                help="rounds of attribute updates per session (default: 10)"),
+            make_option("--adds", type=int, default=2,
+                help="device nodes added by each session during a second set of update rounds (default: 2)"),
+            make_option("--threads", type=int, default=32,
+                help="threads, each with a database connection, serving the sessions (default: 32)"),
+    )
+    help = "Stress ResourceManager with concurrent agent sessions, comparing a global lock against per-scope locks"
+
+    def handle(self, *args, **kwargs):
+        bench = Benchmark(**kwargs)
+        bench.run()
+        bench.cleanup()
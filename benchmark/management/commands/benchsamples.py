@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from benchmark.samples import Benchmark
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+            make_option("--samples", type=int, default=1000000,
+                help="number of samples to write (default: 1000000)"),
+            make_option("--series", type=int, default=1000,
+                help="number of series the samples are spread across (default: 1000)"),
+            make_option("--batch", type=int, default=10000,
+                help="samples written per transaction (default: 10000)"),
+    )
+    help = "Benchmark Sample table write rate of bulk_create against COPY"
+
+    def handle(self, *args, **kwargs):
+        bench = Benchmark(**kwargs)
+        bench.run()
+        bench.cleanup()
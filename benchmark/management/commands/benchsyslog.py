@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmark.syslog_parser import Benchmark
+
+
+class Command(BaseCommand):
+    args = "<journal capture>"
+    option_list = BaseCommand.option_list + (
+            make_option("--chunk", type=int, default=100000,
+                help="lines replayed per timed chunk (default: 100000)"),
+    )
+    help = "Benchmark syslog selector matching by replaying a journal capture (plain text or journalctl -o json, optionally gzipped)"
+
+    def handle(self, *args, **kwargs):
+        if len(args) != 1:
+            raise CommandError("Usage: benchsyslog %s" % self.args)
+
+        Benchmark(args[0], **kwargs).run()
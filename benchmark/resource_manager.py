@@ -0,0 +1,187 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import time
+import threading
+from Queue import Queue, Empty
+
+from django import db
+from django.db import transaction
+from django.test.simple import DjangoTestSuiteRunner
+
+from chroma_core.models import ManagedHost, LNetConfiguration, StorageResourceRecord
+from chroma_core.services.plugin_runner.resource_manager import ResourceManager, ScopeLocks
+from benchmark.generic import GenericBenchmark
+
+
+class GlobalLocks(ScopeLocks):
+    "Serialize every operation, as ResourceManager did before it locked by scope."
+    def scope(self, scannable_id):
+        return self.exclusive()
+
+
+class Benchmark(GenericBenchmark):
+    """
+    Simulate many agent sessions of the linux plugin reporting to one
+    ResourceManager at once.  Each session opens with its own devices, then
+    reports rounds of attribute changes to them, one transaction per round as
+    an agent message would be.  The rounds are then repeated while sessions
+    also report new device nodes, which take the exclusive lock to update
+    LUNs.  The same workload runs with a single global lock and with
+    per-scope locks, each against its own set of hosts.
+    """
+    def __init__(self, sessions=500, devices=10, updates=10, adds=2, threads=32, **kwargs):
+        self.sessions = sessions
+        self.devices = devices
+        self.updates = updates
+        self.adds = adds
+        self.threads = threads
+        self.test_runner = DjangoTestSuiteRunner()
+        self.prepare()
+
+    def prepare(self):
+        from south.management.commands import patch_for_test_db_setup
+
+        self.test_runner.setup_test_environment()
+        # This is necessary to ensure that we use django.core.syncdb()
+        # instead of south's hacked syncdb()
+        patch_for_test_db_setup()
+        self.old_db_config = self.test_runner.setup_databases()
+
+    def resource(self, plugin, klass, **attrs):
+        resource = klass(**attrs)
+        resource.validate()
+        resource._handle = plugin._generate_handle()
+        resource._handle_global = False
+        return resource
+
+    def create_device(self, plugin, host_id, n):
+        "Return an unshared device and its device node on the host."
+        from chroma_core.plugins.linux import UnsharedDevice, LinuxDeviceNode
+
+        path = "/dev/disk/by-path/bench-%d" % n
+        device = self.resource(plugin, UnsharedDevice, path = path, size = 1024 * 1024 * 1024)
+        node = self.resource(plugin, LinuxDeviceNode, path = path, host_id = host_id,
+                             logical_drive = device, parents = [device])
+        return device, node
+
+    def create_sessions(self, resource_manager, name):
+        "Return a list of (scannable_id, plugin, resources, devices, added) for new hosts."
+        from chroma_core.lib.storage_plugin.manager import storage_plugin_manager
+
+        plugin_klass = storage_plugin_manager.get_plugin_class('linux')
+        root_class, root_class_id = storage_plugin_manager.get_plugin_resource_class('linux', 'PluginAgentResources')
+
+        sessions = []
+        for index in xrange(self.sessions):
+            fqdn = "%s%04d.bench" % (name, index)
+            with transaction.commit_on_success():
+                host = ManagedHost.objects.create(fqdn = fqdn, nodename = fqdn, address = fqdn)
+                LNetConfiguration.objects.create(host = host, state = 'lnet_down')
+                record, created = StorageResourceRecord.get_or_create_root(root_class, root_class_id,
+                                                                           {'plugin_name': 'linux', 'host_id': host.id})
+
+            plugin = plugin_klass(resource_manager, record.id)
+            root = record.to_resource()
+            root._handle = plugin._generate_handle()
+            root._handle_global = False
+
+            resources = [root]
+            devices = []
+            for n in xrange(self.devices):
+                device, node = self.create_device(plugin, host.id, n)
+                resources.extend([device, node])
+                devices.append(device)
+            # Reported later, while the devices above are being updated
+            added = [self.create_device(plugin, host.id, n) for n in xrange(self.devices, self.devices + self.adds)]
+            sessions.append((record.id, plugin, resources, devices, added))
+        return sessions
+
+    def measure(self, tasks):
+        "Run the tasks on the worker threads, returning elapsed seconds and each task's latency."
+        queue = Queue()
+        for task in tasks:
+            queue.put(task)
+        latencies = []
+        errors = []
+
+        def work():
+            try:
+                while True:
+                    try:
+                        task = queue.get_nowait()
+                    except Empty:
+                        break
+                    start = time.time()
+                    try:
+                        with transaction.commit_on_success():
+                            task()
+                    except Exception as e:
+                        errors.append(e)
+                    latencies.append(time.time() - start)
+            finally:
+                db.connection.close()
+
+        workers = [threading.Thread(target = work) for i in xrange(self.threads)]
+        start = time.time()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.time() - start
+
+        if errors:
+            print "%d tasks failed, first: %s" % (len(errors), errors[0])
+        return elapsed, latencies
+
+    def report(self, name, phase, elapsed, latencies):
+        latencies = sorted(latencies)
+        print "%s %s: %d tasks in %.2f sec (%.2f tasks/sec), latency mean %.3f p99 %.3f max %.3f sec" % (
+            name, phase, len(latencies), elapsed, len(latencies) / elapsed,
+            sum(latencies) / len(latencies), latencies[int(len(latencies) * 0.99)], latencies[-1])
+
+    def run(self):
+        print "%d sessions with %d devices each, %d update rounds, %d threads" % (
+            self.sessions, self.devices, self.updates, self.threads)
+
+        for name, locks in [('global', GlobalLocks), ('scope', ScopeLocks)]:
+            resource_manager = ResourceManager()
+            resource_manager._locks = locks()
+            sessions = self.create_sessions(resource_manager, name)
+
+            def session_open(scannable_id, plugin, resources):
+                return lambda: resource_manager.session_open(plugin, scannable_id, resources, 60)
+
+            elapsed, latencies = self.measure([session_open(scannable_id, plugin, resources)
+                                               for scannable_id, plugin, resources, devices, added in sessions])
+            self.report(name, 'open', elapsed, latencies)
+
+            def session_update(scannable_id, devices, size):
+                def update():
+                    for device in devices:
+                        resource_manager.session_update_resource(scannable_id, device._handle, {'size': size})
+                return update
+
+            elapsed, latencies = self.measure([session_update(scannable_id, devices, 1024 * 1024 * (n + 1))
+                                               for n in xrange(self.updates)
+                                               for scannable_id, plugin, resources, devices, added in sessions])
+            self.report(name, 'update', elapsed, latencies)
+
+            def session_add(scannable_id, resources):
+                return lambda: resource_manager.session_add_resources(scannable_id, resources)
+
+            # Each session's new device nodes are queued amongst its updates
+            tasks = []
+            for n in xrange(self.updates):
+                for scannable_id, plugin, resources, devices, added in sessions:
+                    tasks.append(session_update(scannable_id, devices, 1024 * 1024 * (self.updates + n + 1)))
+                    if n < len(added):
+                        tasks.append(session_add(scannable_id, list(added[n])))
+            elapsed, latencies = self.measure(tasks)
+            self.report(name, 'update+add', elapsed, latencies)
+
+    def cleanup(self):
+        self.test_runner.teardown_databases(self.old_db_config)
+        self.test_runner.teardown_test_environment()
@@ -0,0 +1,76 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import time
+import itertools
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.test.simple import DjangoTestSuiteRunner
+from django.utils.timezone import utc
+
+from chroma_core.models import Point, Stats
+from benchmark.generic import GenericBenchmark
+
+
+class Benchmark(GenericBenchmark):
+    """
+    Compare the write rate into the most granular Sample table of the
+    ORM bulk_create path against the COPY path used by Sample.insert.
+    """
+    def __init__(self, samples=1000000, series=1000, batch=10000, **kwargs):
+        self.samples = samples
+        self.series = series
+        self.batch = batch
+        self.test_runner = DjangoTestSuiteRunner()
+        self.prepare()
+
+    def prepare(self):
+        from south.management.commands import patch_for_test_db_setup
+
+        self.test_runner.setup_test_environment()
+        # This is necessary to ensure that we use django.core.syncdb()
+        # instead of south's hacked syncdb()
+        patch_for_test_db_setup()
+        self.old_db_config = self.test_runner.setup_databases()
+
+    def rows(self):
+        "Generate (id, point) rows, one point per series every sample step."
+        model = Stats[0]
+        start = model.floor(datetime.now(utc))
+        for index in xrange(self.samples):
+            step, id = divmod(index, self.series)
+            yield id, Point(start + timedelta(seconds=step * model.step), float(index), 1)
+
+    def bulk_create(self, rows):
+        model = Stats[0]
+        model.objects.bulk_create(model(id, *point) for id, point in rows)
+
+    def copy(self, rows):
+        Stats[0].copy(rows)
+
+    def measure(self, write):
+        "Return elapsed seconds to write all rows in batches."
+        Stats.delete_all()
+        rows = self.rows()
+        start = time.time()
+        while True:
+            batch = list(itertools.islice(rows, self.batch))
+            if not batch:
+                break
+            with transaction.commit_on_success():
+                write(batch)
+        return time.time() - start
+
+    def run(self):
+        print "%d samples across %d series, %d rows per batch" % (self.samples, self.series, self.batch)
+        for name, write in [('bulk_create', self.bulk_create), ('copy', self.copy)]:
+            interval = self.measure(write)
+            print "%s: %d rows in %.2f sec (%.2f rows/sec)" % (name, self.samples, interval, self.samples / interval)
+
+    def cleanup(self):
+        Stats.delete_all()
+        self.test_runner.teardown_databases(self.old_db_config)
+        self.test_runner.teardown_test_environment()
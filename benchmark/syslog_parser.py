@@ -0,0 +1,74 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import gzip
+import json
+import time
+import itertools
+
+from chroma_core.services.syslog.parser import LogMessageParser, SelectorMatcher, _plain_find_one_in_many
+from benchmark.generic import GenericBenchmark
+
+
+class Benchmark(GenericBenchmark):
+    """
+    Replay a journal capture through the syslog selector matching, comparing
+    the per-selector str.find scan against the compiled SelectorMatcher.
+
+    The capture is either plain text (one message per line) or the output of
+    `journalctl -o json`, optionally gzipped, and is streamed in chunks so
+    that captures larger than memory can be replayed.
+    """
+    def __init__(self, path, chunk=100000, **kwargs):
+        self.path = path
+        self.chunk = chunk
+        self.selectors = LogMessageParser.selectors
+
+    def messages(self):
+        capture = gzip.open(self.path) if self.path.endswith('.gz') else open(self.path)
+        with capture:
+            for line in capture:
+                if line.startswith('{'):
+                    record = json.loads(line)
+                    line = record.get('MESSAGE') or record.get('message') or ''
+                    if not isinstance(line, basestring):
+                        # journalctl renders non-UTF8 messages as byte arrays
+                        line = ''.join(chr(c) for c in line)
+                yield line.rstrip('\n')
+
+    def plain(self, lines):
+        return [_plain_find_one_in_many(line, self.selectors.keys()) for line in lines]
+
+    def compiled(self, lines):
+        matcher = self.matcher
+        return [matcher.match(line) for line in lines]
+
+    def run(self):
+        self.matcher = SelectorMatcher(self.selectors)
+        elapsed = {'plain': 0.0, 'compiled': 0.0}
+        count = hits = 0
+        messages = self.messages()
+        while True:
+            lines = list(itertools.islice(messages, self.chunk))
+            if not lines:
+                break
+
+            start = time.time()
+            plain = self.plain(lines)
+            elapsed['plain'] += time.time() - start
+
+            start = time.time()
+            compiled = self.compiled(lines)
+            elapsed['compiled'] += time.time() - start
+
+            for line, needle, handler in zip(lines, plain, compiled):
+                assert (needle is None) == (handler is None), "Matchers disagree on '%s'" % line
+            count += len(lines)
+            hits += len(filter(None, compiled))
+
+        print "%d lines, %d selector hits" % (count, hits)
+        for name in ['plain', 'compiled']:
+            interval = elapsed[name]
+            print "%s: %.2f sec (%.2f lines/sec)" % (name, interval, count / interval if interval else 0.0)
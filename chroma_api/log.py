@@ -3,11 +3,17 @@
 # license that can be found in the LICENSE file.
 
 
-from chroma_core.lib.util import normalize_nid
+import json
+
+from chroma_core.lib.log_substitution import substitution_index
 from chroma_api.utils import DateSerializer
+from iml_common.lib.date_time import IMLDateTime
 
 from tastypie import fields
 from tastypie.authorization import DjangoAuthorization
+from tastypie.exceptions import ImmediateHttpResponse
+from tastypie.http import HttpBadRequest
+from tastypie.paginator import Paginator
 
 from chroma_api.authentication import AnonymousAuthentication
 from chroma_core.models.log import LogMessage, MessageClass
@@ -31,12 +37,61 @@ class LogAuthorization(DjangoAuthorization):
             return object_list.filter(message_class__in = [MessageClass.LUSTRE, MessageClass.LUSTRE_ERROR])
 
 
-class LogResource(ChromaModelResource):
+class LogPaginator(Paginator):
     """
-    syslog messages collected by the manager server.
+    Pages through log messages newest first by (datetime, id) when the
+    request has a ``before`` argument, instead of by OFFSET, which has to
+    skip over every message of the earlier pages.  An empty ``before`` gets
+    the newest page, and the ``next`` URI of each page carries the
+    ``before`` of the page after it.  The total count is not computed.
+    """
+    def page(self):
+        before = self.request_data.get('before')
+        if before is None:
+            return super(LogPaginator, self).page()
+
+        objects = self.objects.order_by('-datetime', '-id')
+        if before:
+            try:
+                before_datetime, before_id = before.rsplit(',', 1)
+                before_datetime = IMLDateTime.parse(before_datetime).as_datetime
+                before_id = int(before_id)
+            except ValueError:
+                raise ImmediateHttpResponse(response = HttpBadRequest("before must be <datetime>,<id>"))
+
+            table = LogMessage._meta.db_table
+            objects = objects.extra(where = ['("%s"."datetime", "%s"."id") < (%%s, %%s)' % (table, table)],
+                                    params = [before_datetime, before_id])
+
+        limit = self.get_limit()
+        if limit:
+            objects = objects[:limit]
+        objects = list(objects)
+
+        meta = {'limit': limit, 'before': before, 'next': None, 'previous': None, 'total_count': None}
+        if limit and len(objects) == limit:
+            meta['next'] = self._generate_before_uri(limit, objects[-1])
+
+        return {self.collection_name: objects, 'meta': meta}
+
+    def _generate_before_uri(self, limit, last):
+        if self.resource_uri is None:
+            return None
 
+        request_params = self.request_data.copy()
+        request_params.pop('offset', None)
+        request_params['limit'] = limit
+        request_params['before'] = "%s,%s" % (last.datetime.isoformat(), last.id)
+        return '%s?%s' % (self.resource_uri, request_params.urlencode())
 
 
+class LogResource(ChromaModelResource):
+    """
+    syslog messages collected by the manager server.
+
+    Messages may be searched for words with the ``search`` argument, which
+    uses a full text index rather than scanning every message like the
+    ``message`` filters do, and paged with ``before`` (see ``LogPaginator``).
     """
     substitutions = fields.ListField(null = True,
                                      help_text = "List of dictionaries describing substrings which "
@@ -62,6 +117,7 @@ class LogResource(ChromaModelResource):
         }
 
         serializer = DateSerializer()
+        paginator_class = LogPaginator
         authorization = LogAuthorization()
         authentication = AnonymousAuthentication()
         ordering = ['datetime', 'fqdn']
@@ -88,44 +144,33 @@ class LogResource(ChromaModelResource):
 
         return super(LogResource, self).build_filters(filters)
 
+    def apply_filters(self, request, applicable_filters):
+        objects = super(LogResource, self).apply_filters(request, applicable_filters)
+
+        search = request.GET.get('search')
+        if search:
+            # Must match the expression of the chroma_core_logmessage_message_fts index
+            objects = objects.extra(where = ["to_tsvector('simple', \"%s\".\"message\") @@ plainto_tsquery('simple', %%s)" % LogMessage._meta.db_table],
+                                    params = [search])
+
+        return objects
+
     def _substitutions(self, obj):
-        message = obj.message
-        from chroma_api import api_log
         from chroma_api.urls import api
 
-        from chroma_core.models import ManagedHost, ManagedTarget
-        import re
+        if obj.substitutions is None:
+            matches = substitution_index.find(obj.message)
+        else:
+            matches = json.loads(obj.substitutions)
 
         substitutions = []
-
-        def substitute(obj, match, group = 1):
-            resource_uri = api.get_resource_uri(obj)
-            substitutions.append({
-                'start': match.start(group),
-                'end': match.end(group),
-                'label': obj.get_label(),
-                'resource_uri': resource_uri})
-
-        # TODO: detect other NID types (cray?)
-        nid_regex = re.compile("(\d{1,3}\.){3}\d{1,3}@(tcp|ib)(_\d+)?")
-        target_regex = re.compile("[^\w](\w{1,8}-(MDT|OST)[\da-f]{4})")
-        for match in nid_regex.finditer(message):
-            nid = match.group(0)
-            nid = normalize_nid(nid)
-            try:
-                host = ManagedHost.get_by_nid(nid)
-            except ManagedHost.DoesNotExist:
-                api_log.warn("No host has NID %s" % nid)
-                continue
-            except ManagedHost.MultipleObjectsReturned:
-                api_log.warn("Multiple hosts have NID %s" % nid)
-                continue
-            if host.state != 'removed':
-                substitute(host, match, 0)
-
-        for match in target_regex.finditer(message):
-            target_name = match.group(1)
-            for target in ManagedTarget.objects.filter(name=target_name)[:1]:
-                substitute(target, match)
+        for start, end, kind, id in matches:
+            referent = substitution_index.get(kind, id)
+            if referent is not None:
+                substitutions.append({
+                    'start': start,
+                    'end': end,
+                    'label': referent.get_label(),
+                    'resource_uri': api.get_resource_uri(referent)})
 
         return sorted(substitutions, key=lambda sub: sub['start'])
@@ -3,18 +3,153 @@
 # license that can be found in the LICENSE file.
 
 import json
+import time
+import threading
 
+from django import db
+from django.http import HttpResponse
 from tastypie.exceptions import ImmediateHttpResponse
 from tastypie.http import HttpNotModified
 
 from chroma_core.services.job_scheduler.job_scheduler_client import JobSchedulerClient
 from chroma_core.services import log_register
+from chroma_core.lib.util import cooperative_event
 
 import settings
 
 log = log_register(__name__)
 
 
+class _Subscription(object):
+    def __init__(self, tables):
+        self.tables = tables
+        self.waiters = 0
+        self.version = None
+        self.changed = cooperative_event()
+
+    def publish(self, version):
+        changed, self.changed = self.changed, cooperative_event()
+        self.version = version
+        changed.set()
+
+
+class _SharedResponse(object):
+    def __init__(self, expires):
+        self.expires = expires
+        self.response = None
+        self.ready = cooperative_event()
+
+
+class LongPollingBroker(object):
+    """Shares the waits of the long polling requests of this process.
+
+    Each set of tables has one subscription: a thread which calls wait_table_change on the
+    job_scheduler while requests are waiting on the set, and publishes the table timestamps
+    it returns as the version of the set, waking the requests.  Requests woken with the same
+    version of the same resource and query share one response, dispatched by the first.
+    """
+    RESPONSE_CACHE_SECONDS = 10
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._responses = {}
+
+    def _subscribe(self, subscription):
+        version = {'max_timestamp': 0}
+        while True:
+            with self._lock:
+                if not subscription.waiters:
+                    # Changes will be missed from now on, so the next waiters need a new subscription
+                    del self._subscriptions[subscription.tables]
+                    return
+
+            try:
+                table_timestamps = JobSchedulerClient.wait_table_change(version,
+                                                                        list(subscription.tables),
+                                                                        settings.LONG_POLL_TIMEOUT_SECONDS)
+            except Exception as e:
+                log.error("Long polling subscription to %s failed: %s" % (subscription.tables, e))
+                time.sleep(1)
+            else:
+                if table_timestamps:
+                    version = table_timestamps
+                    subscription.publish(version)
+
+    def wait(self, tables, table_timestamps, timeout):
+        """Return the timestamps of `tables` once any of them has changed since
+        table_timestamps['max_timestamp'], or 0 if none has within `timeout` seconds."""
+        tables = tuple(sorted(tables))
+        deadline = time.time() + timeout
+
+        with self._lock:
+            try:
+                subscription = self._subscriptions[tables]
+            except KeyError:
+                subscription = self._subscriptions[tables] = _Subscription(tables)
+                thread = threading.Thread(target = self._subscribe, args = (subscription,))
+                thread.daemon = True
+                thread.start()
+            subscription.waiters += 1
+
+        try:
+            while True:
+                changed = subscription.changed
+                version = subscription.version
+                if version and version['max_timestamp'] > int(table_timestamps['max_timestamp']):
+                    return version
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return 0
+                changed.wait(remaining)
+        finally:
+            with self._lock:
+                subscription.waiters -= 1
+
+    def response(self, key, dispatch):
+        """Return the response for `key`, calling dispatch() unless a request with the same key
+        did within RESPONSE_CACHE_SECONDS.  Only successful responses are shared."""
+        now = time.time()
+        with self._lock:
+            for expired_key in [k for k, shared in self._responses.items() if shared.expires < now]:
+                del self._responses[expired_key]
+
+            shared = self._responses.get(key)
+            if shared is None:
+                shared = self._responses[key] = _SharedResponse(now + self.RESPONSE_CACHE_SECONDS)
+                owner = True
+            else:
+                owner = False
+
+        if owner:
+            try:
+                response = dispatch()
+                if response.status_code != 200:
+                    return response
+                shared.response = response
+            finally:
+                if shared.response is None:
+                    with self._lock:
+                        self._responses.pop(key, None)
+                shared.ready.set()
+        else:
+            shared.ready.wait(settings.LONG_POLL_TIMEOUT_SECONDS)
+            if shared.response is None:
+                return dispatch()
+
+        # Each request gets a copy, which it may modify
+        response = HttpResponse(shared.response.content,
+                                status = shared.response.status_code,
+                                content_type = shared.response['Content-Type'])
+        for header, value in shared.response.items():
+            response[header] = value
+        return response
+
+
+broker = LongPollingBroker()
+
+
 class LongPollingAPI(object):
     long_polling_tables = None                  # The caller must declare a set of long polling tables.
 
@@ -38,13 +173,24 @@ class LongPollingAPI(object):
             else:
                 table_timestamps = json.loads(table_timestamps)
 
-            table_timestamps = JobSchedulerClient.wait_table_change(table_timestamps,
-                                                                    [table._meta.db_table for table in self.long_polling_tables],
-                                                                    settings.LONG_POLL_TIMEOUT_SECONDS)
+            # This can be a long time so we don't want to hang onto any database connection
+            db.connection.close()
+
+            table_timestamps = broker.wait([table._meta.db_table for table in self.long_polling_tables],
+                                           table_timestamps,
+                                           settings.LONG_POLL_TIMEOUT_SECONDS)
 
             if table_timestamps:
+                # Requests woken by the same change share the response, so key it by everything it depends on
+                key = (self.__class__.__name__,
+                       request_type,
+                       request.path,
+                       tuple(sorted((name, tuple(values)) for name, values in request.GET.lists() if name != 'last_modified')),
+                       request.user.id,
+                       json.dumps(table_timestamps, sort_keys = True))
+
                 # We want the super of the thing that called us, because it might have other overloads
-                response = super(self.__class__, self).dispatch(request_type, request, **kwargs)
+                response = broker.response(key, lambda: super(self.__class__, self).dispatch(request_type, request, **kwargs))
 
                 if request.GET.get('last_modified') is not None:
                     # Expensive but reliable method, this is only used when a user types from a browser
@@ -8,7 +8,7 @@ import traceback
 import logging
 import itertools
 from chroma_core.models.jobs import SchedulingError
-import bisect
+import operator
 from collections import namedtuple
 
 
@@ -32,7 +32,7 @@ from chroma_api.chroma_model_resource import ChromaModelResource
 import chroma_core.lib.conf_param
 from chroma_core.models import utils as conversion_util
 from iml_common.lib.date_time import IMLDateTime
-from chroma_core.lib.metrics import MetricStore, Counter
+from chroma_core.lib.metrics import MetricStore
 
 from collections import defaultdict
 from django.db.models.query import QuerySet
@@ -479,6 +479,11 @@ class MetricResource:
             return metrics_obj.fetch(metrics, begin, end, max_points, num_points)
         return dict([metrics_obj.fetch_last(metrics)])
 
+    def _fetch_many(self, metrics_objs, metrics, begin, end, job, max_points, num_points):
+        if begin and end and not job:
+            return MetricStore.fetch_many(metrics_objs, metrics, begin, end, max_points, num_points)
+        return [self._fetch(metrics_obj, metrics, begin, end, job, max_points, num_points) for metrics_obj in metrics_objs]
+
     def get_metric_detail(self, request, metrics, begin, end, job, max_points, num_points, **kwargs):
         bundle = self.build_bundle(request=request)
         obj = self.cached_obj_get(
@@ -488,8 +493,9 @@ class MetricResource:
             # FIXME: there is a level of indirection here to go from a StorageResourceRecord to individual time series.
             # Although no longer necessary, time series are still stored in separate resources.
             stats = defaultdict(dict)
-            for stat in StorageResourceStatistic.objects.filter(storage_resource=obj, name__in=metrics):
-                for dt, data in self._fetch(stat.metrics, metrics, begin, end, job, max_points, num_points).items():
+            statistics = StorageResourceStatistic.objects.filter(storage_resource=obj, name__in=metrics)
+            for result in self._fetch_many([stat.metrics for stat in statistics], metrics, begin, end, job, max_points, num_points):
+                for dt, data in result.items():
                     stats[dt].update(data)
         else:
             stats = self._fetch(MetricStore(obj), metrics, begin, end, job, max_points, num_points)
@@ -502,19 +508,32 @@ class MetricResource:
         # Want an overall reduction into one series
         if reduce_fn not in ('sum', 'average'):
             raise NotImplementedError
-        datetimes = dict((obj_id, sorted(data)) for obj_id, data in results.items())
+        datetimes = sorted(set(itertools.chain.from_iterable(results.values())))
+        positions = dict((dt, index) for index, dt in enumerate(datetimes))
+        names = set(metrics).union(*(data for stats in results.values() for data in stats.values()))
+        # one column per name aligned with all datetimes, summed in place of per timestamp lookups
+        columns = dict((name, [0.0] * len(datetimes)) for name in names)
+        counts = dict((name, [0] * len(datetimes)) for name in names.difference(metrics))
+        for stats in results.values():
+            if not stats:
+                continue
+            # Each value spans up to the next one; the earliest also fills the datetimes before it
+            dts = sorted(stats)
+            spans = zip(dts, [0] + [positions[dt] for dt in dts[1:]], [positions[dt] for dt in dts[1:]] + [len(datetimes)])
+            for name in names:
+                values = []
+                for dt, start, stop in spans:
+                    values += [stats[dt].get(name, 0.0)] * (stop - start)
+                columns[name] = map(operator.add, columns[name], values)
+                if name in counts:
+                    present = []
+                    for dt, start, stop in spans:
+                        present += [int(name in stats[dt])] * (stop - start)
+                    counts[name] = map(operator.add, counts[name], present)
+        divisor = len(results) if reduce_fn == 'average' else 1
         result = {}
-        for dt in set(itertools.chain(*datetimes.values())):
-            result[dt] = counter = Counter.fromkeys(metrics, 0.0)
-            for obj_id, stats in results.items():
-                data = stats.get(dt, {})
-                dts = datetimes[obj_id]
-                if dts and not data:  # Didn't have one for this exact timestamp, do we have one before?
-                    data = stats[dts[max(bisect.bisect(dts, dt) - 1, 0)]]
-                counter.update(data)
-            if reduce_fn == 'average':
-                for name in counter:
-                    counter[name] /= len(results)
+        for index, dt in enumerate(datetimes):
+            result[dt] = dict((name, columns[name][index] / divisor) for name in names if name not in counts or counts[name][index])
         return result
 
     def get_metric_list(self, request, metrics, begin, end, job, max_points, num_points, **kwargs):
@@ -532,7 +551,8 @@ class MetricResource:
             raise custom_response(self, request, http.HttpNotFound, {'metrics': exc})
         metrics = metrics or set(itertools.chain.from_iterable(MetricStore(obj).names for obj in objs))
 
-        result = dict((obj.id, self._fetch(MetricStore(obj), metrics, begin, end, job, max_points, num_points)) for obj in objs)
+        results = self._fetch_many([MetricStore(obj) for obj in objs], metrics, begin, end, job, max_points, num_points)
+        result = dict(zip((obj.id for obj in objs), results))
         if not reduce_fn:
             for obj_id, stats in result.items():
                 result[obj_id] = self._format(stats)
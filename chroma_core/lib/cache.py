@@ -3,6 +3,8 @@
 # license that can be found in the LICENSE file.
 
 
+import time
+import threading
 from collections import defaultdict
 from chroma_core.services import log_register
 
@@ -10,6 +12,57 @@ from chroma_core.services import log_register
 log = log_register(__name__)
 
 
+class ReloadingIndex(object):
+    """
+    Base of in-memory indexes of database objects, for lookups without a query each.
+    Subclasses load their dicts in _load, and look keys up in them with _lookup.
+
+    Reloaded when a lookup misses a key which has not missed before, and every
+    RELOAD_INTERVAL seconds to pick up changes made by other processes.  Keys which
+    missed are remembered across reloads, up to MAX_MISSED, so that keys which are
+    never found, such as those of other objects, do not cause a reload each.
+    """
+    RELOAD_INTERVAL = 60
+    MAX_MISSED = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded_at = 0
+        self._missed = set()
+
+    def _load(self):
+        raise NotImplementedError()
+
+    def reload(self):
+        with self._lock:
+            self._load()
+            self._loaded_at = time.time()
+
+    def expire(self):
+        "Reload at the next lookup"
+        self._loaded_at = 0
+
+    def _lookup(self, index, key):
+        if time.time() - self._loaded_at > self.RELOAD_INTERVAL:
+            self.reload()
+        try:
+            return getattr(self, index)[key]
+        except KeyError:
+            with self._lock:
+                missed = (index, key) in self._missed
+            if missed:
+                raise
+        self.reload()
+        try:
+            return getattr(self, index)[key]
+        except KeyError:
+            with self._lock:
+                if len(self._missed) >= self.MAX_MISSED:
+                    self._missed.clear()
+                self._missed.add((index, key))
+            raise
+
+
 class ObjectCache(object):
     instance = None
 
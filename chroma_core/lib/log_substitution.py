@@ -0,0 +1,133 @@
+# Copyright (c) 2018 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import re
+import json
+
+from django.db.models.signals import post_save, post_delete
+
+from chroma_core.lib.cache import ReloadingIndex
+from chroma_core.lib.util import normalize_nid
+from chroma_core.services import log_register
+
+
+log = log_register(__name__)
+
+# TODO: detect other NID types (cray?)
+NID_REGEX = re.compile("(\d{1,3}\.){3}\d{1,3}@(tcp|ib)(_\d+)?")
+TARGET_REGEX = re.compile("[^\w](\w{1,8}-(MDT|OST)[\da-f]{4})")
+
+HOST = 'host'
+TARGET = 'target'
+
+
+class SubstitutionIndex(ReloadingIndex):
+    """
+    Hosts by NID and targets by name, for finding the objects referred to by a
+    log message without a query each.  NIDs are resolved the same way as
+    ManagedHost.get_by_nid.
+
+    Also reloaded when a host, network interface or target is saved or deleted
+    in this process.  Remembering missed keys matters here, because most NIDs
+    in the logs are those of clients, which are never found.
+    """
+
+    def __init__(self):
+        super(SubstitutionIndex, self).__init__()
+        self._hosts = {}
+        self._targets = {}
+        self._nids = {}
+        self._target_names = {}
+        self._watching = False
+
+    def _watch(self):
+        from chroma_core.models import ManagedHost, ManagedTarget, NetworkInterface
+
+        def changed(sender, instance, **kwargs):
+            if isinstance(instance, (ManagedHost, ManagedTarget, NetworkInterface)):
+                self.expire()
+
+        post_save.connect(changed, weak = False)
+        post_delete.connect(changed, weak = False)
+        self._watching = True
+
+    def _load(self):
+        from chroma_core.models import ManagedHost, ManagedTarget, NetworkInterface
+
+        if not self._watching:
+            self._watch()
+
+        hosts = dict((host.id, host) for host in ManagedHost._base_manager.filter(not_deleted = True))
+        host_ids = {}
+        for address, lnd_type, host_id in NetworkInterface.objects.filter(host__in = hosts.keys()).values_list('inet4_address', 'type', 'host_id'):
+            host_ids.setdefault((address, lnd_type), set()).add(host_id)
+
+        nids = {}
+        for key, ids in host_ids.items():
+            if len(ids) == 1:
+                nids[key] = ids.pop()
+            elif len(set(hosts[host_id].fqdn for host_id in ids)) == 1:
+                # All the hosts with this NID have the same FQDN, so pick one
+                nids[key] = min(ids)
+            else:
+                # More than one host has this NID, so we cannot pick one
+                nids[key] = None
+
+        targets = {}
+        target_names = {}
+        for target in ManagedTarget.objects.all():
+            targets[target.id] = target
+            target_names.setdefault(target.name, target.id)
+
+        self._hosts = hosts
+        self._nids = nids
+        self._targets = targets
+        self._target_names = target_names
+
+    def get(self, kind, id):
+        """Return the host or target with this id, or None if it has gone or the host is removed"""
+        try:
+            obj = self._lookup('_hosts' if kind == HOST else '_targets', id)
+        except KeyError:
+            return None
+
+        if kind == HOST and obj.state == 'removed':
+            return None
+        return obj
+
+    def find(self, message):
+        """Return a list of (start, end, kind, id) of the hosts and targets referred to by message"""
+        from chroma_core.models import Nid
+
+        matches = []
+        for match in NID_REGEX.finditer(message):
+            nid_string = normalize_nid(match.group(0))
+            nid = Nid.split_nid_string(nid_string)
+            try:
+                host_id = self._lookup('_nids', (nid.nid_address, nid.lnd_type))
+            except KeyError:
+                log.warn("No host has NID %s" % nid_string)
+                continue
+            if host_id is None:
+                log.warn("Multiple hosts have NID %s" % nid_string)
+                continue
+            if self.get(HOST, host_id) is not None:
+                matches.append((match.start(0), match.end(0), HOST, host_id))
+
+        for match in TARGET_REGEX.finditer(message):
+            try:
+                target_id = self._lookup('_target_names', match.group(1))
+            except KeyError:
+                continue
+            matches.append((match.start(1), match.end(1), TARGET, target_id))
+
+        return matches
+
+    def encode(self, message):
+        """Return the matches of find() serialized for storing with the message"""
+        return json.dumps(self.find(message))
+
+
+substitution_index = SubstitutionIndex()
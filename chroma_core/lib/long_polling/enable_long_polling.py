@@ -17,6 +17,8 @@ from django.db import transaction
 from chroma_core.lib import util
 from chroma_core.services.log import log_register
 
+import settings
+
 is_job_scheduler = ('job_scheduler' in sys.argv)
 
 log = log_register(__name__.split('.')[-1])
@@ -40,6 +42,10 @@ class DatabaseChangedThread(Thread):
 
 
 def _propagate_table_change(table_names):
+    if settings.LONG_POLLING_NOTIFY:
+        # The job_scheduler learns of changes from database triggers
+        return
+
     timestamp = int(time.time() * util.SECONDSTOMICROSECONDS)
 
     if is_job_scheduler:
@@ -4,7 +4,9 @@
 
 
 import threading
+import select
 import time
+import traceback
 
 from django import db
 
@@ -12,6 +14,9 @@ from collections import defaultdict
 
 from chroma_core.lib import util
 from chroma_core.services.job_scheduler import lock_cache
+from chroma_core.services.log import log_register
+
+log = log_register(__name__.split('.')[-1])
 
 # table_name: list events
 # When waiting for a table to change a semaphore is added to the list this is trigger when that table changes
@@ -82,3 +87,64 @@ def _table_timestamps(tables_list):
     table_timestamps['max_timestamp'] = max_timestamp
 
     return table_timestamps
+
+
+# Channel notified by the triggers of migration 0044 with the name of each changed table, when LONG_POLLING_NOTIFY is set
+NOTIFY_CHANNEL = 'chroma_table_changed'
+
+
+class TableChangeListener(object):
+    """
+    This thread LISTENs for notifications from the triggers on long polled tables,
+    and passes the tables changed to tables_changed, timestamped when received.
+    If the connection is lost it reconnects and LISTENs again.
+    """
+    RECONNECT_INTERVAL = 5
+
+    def __init__(self):
+        self._stopping = threading.Event()
+
+    def run(self):
+        from psycopg2 import OperationalError, InterfaceError
+
+        reconnecting = False
+        while not self._stopping.is_set():
+            try:
+                connection = self._listen()
+                if reconnecting:
+                    # Notifications sent while disconnected are lost, so wake every waiter
+                    with operation_lock:
+                        tables = list(events)
+                    tables_changed(int(time.time() * util.SECONDSTOMICROSECONDS), tables)
+                    reconnecting = False
+                self._receive(connection)
+            except (OperationalError, InterfaceError):
+                log.warning("Lost connection listening for table changes: %s" % traceback.format_exc())
+                reconnecting = True
+                self._stopping.wait(self.RECONNECT_INTERVAL)
+            finally:
+                db.connection.close()
+
+    def _listen(self):
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        cursor = db.connection.cursor()
+        connection = db.connection.connection
+        connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor.execute("LISTEN %s" % NOTIFY_CHANNEL)
+        return connection
+
+    def _receive(self, connection):
+        while not self._stopping.is_set():
+            if select.select([connection], [], [], 1) == ([], [], []):
+                continue
+
+            connection.poll()
+            tables = set()
+            while connection.notifies:
+                tables.add(connection.notifies.pop().payload)
+            if tables:
+                tables_changed(int(time.time() * util.SECONDSTOMICROSECONDS), list(tables))
+
+    def stop(self):
+        self._stopping.set()
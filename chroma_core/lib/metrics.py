@@ -9,6 +9,7 @@ import collections
 from datetime import datetime
 from chroma_core.services import log_register
 from django.utils.timezone import utc
+from django.contrib.contenttypes.models import ContentType
 from chroma_core.models import Point, Series, Stats, ManagedHost, ManagedTarget, ManagedFilesystem
 from chroma_core.lib.storage_plugin.api import statistics
 from chroma_core.lib import scheduler
@@ -43,11 +44,11 @@ class MetricStore(object):
 
     def serialize(self, update):
         "Generate serialized samples (id, dt, value) from a timestamped update dict."
+        ids = Series.resolve(self.measured_object, dict((name, item['type']) for data in update.values() for name, item in data.items()))
         for ts, data in update.items():
             dt = datetime.fromtimestamp(ts, utc)
             for name, item in data.items():
-                series = Series.get(self.measured_object, name, item['type'])
-                yield series.id, dt, item['value']
+                yield ids[name], dt, item['value']
 
     def clear(self):
         "Remove all associated series."
@@ -62,18 +63,33 @@ class MetricStore(object):
 
     def fetch(self, fetch_metrics, begin, end, max_points=float('inf'), num_points=0):
         "Return datetimes with dicts of field names and values."
-        result = collections.defaultdict(dict)
-        types = set()
+        return self.fetch_many([self], fetch_metrics, begin, end, max_points, num_points)[0]
+
+    @staticmethod
+    def fetch_many(stores, fetch_metrics, begin, end, max_points=float('inf'), num_points=0):
+        "Return list of fetch results for multiple metric stores, selecting all of their series at once."
         end = Stats[0].floor(end)  # exclude points from a partial sample
-        for series in Series.filter(self.measured_object, name__in=fetch_metrics):
-            types.add(series.type)
-            minimum = 0.0 if series.type == 'Counter' else float('-inf')
-            for point in Stats.select(series.id, begin, end, rate=series.type in ('Counter', 'Derive'), maxlen=max_points, fixed=num_points):
-                result[point.dt][series.name] = max(minimum, point.mean)
-        # if absolute and derived values are mixed, the earliest value will be incomplete
-        if result and types > set(['Gauge']) and len(result[min(result)]) < len(fetch_metrics):
-            del result[min(result)]
-        return dict(result)
+        measured_series = collections.defaultdict(list)
+        for series in Series.filter_many([store.measured_object for store in stores], name__in=fetch_metrics):
+            measured_series[series.content_type_id, series.object_id].append(series)
+        ids = [series.id for group in measured_series.values() for series in group]
+        rates = set(series.id for group in measured_series.values() for series in group if series.type in ('Counter', 'Derive'))
+        selection = Stats.select_many(ids, begin, end, rates=rates, maxlen=max_points, fixed=num_points)
+        results = []
+        for store in stores:
+            result = collections.defaultdict(dict)
+            types = set()
+            ct = ContentType.objects.get_for_model(store.measured_object)
+            for series in measured_series[ct.id, store.measured_object.id]:
+                types.add(series.type)
+                minimum = 0.0 if series.type == 'Counter' else float('-inf')
+                for point in selection[series.id]:
+                    result[point.dt][series.name] = max(minimum, point.mean)
+            # if absolute and derived values are mixed, the earliest value will be incomplete
+            if result and types > set(['Gauge']) and len(result[min(result)]) < len(fetch_metrics):
+                del result[min(result)]
+            results.append(dict(result))
+        return results
 
     def fetch_last(self, fetch_metrics):
         "Return latest datetime and dict of field names and values."
@@ -3,20 +3,122 @@
 # license that can be found in the LICENSE file.
 
 
+import copy
 import logging
+import threading
+import time
 
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.generic import GenericForeignKey
 from django.utils import timezone
-from django.db import IntegrityError
+from django.db import IntegrityError, DatabaseError, transaction
 
 from chroma_core.models.sparse_model import SparseModel
 from chroma_core.models.utils import STR_TO_SEVERITY
 from chroma_core.lib.job import job_log
 
 
+class ActiveAlertIndex(object):
+    """
+    The active alert of each (alert type, item content type id, item id), so that
+    raising an alert which is already active only has to check it by id.
+    Kept up to date by the saves and deletes of alerts in this process, and
+    reconciled with the database on first use and every RECONCILE_INTERVAL seconds
+    to pick up the alerts raised and lowered by other processes.
+
+    Neither hits nor misses are authoritative, since another process may have raised
+    or lowered the alert since the last reconcile, so raising an alert checks a hit
+    is still active, and lowering an alert always queries the database.
+    """
+    RECONCILE_INTERVAL = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reconciled_at = 0
+        self._alerts = {}  # Map of key to active alert, or to its id until the alert is loaded
+        self._keys = {}  # Map of alert id to key
+        self._reconciling = []  # Lists of the changes made during each reconcile in progress
+
+    def reset(self):
+        with self._lock:
+            self._alerts = {}
+            self._keys = {}
+            self._reconciled_at = 0
+
+    def reconcile(self):
+        started_at = time.time()
+        changes = []
+        with self._lock:
+            self._reconciling.append(changes)
+
+        try:
+            alerts = {}
+            keys = {}
+            for record_type, item_type_id, item_id, alert_id in AlertState.objects.filter(active = True).values_list(
+                    'record_type', 'alert_item_type_id', 'alert_item_id', 'id'):
+                key = (record_type, item_type_id, item_id)
+                current = self._alerts.get(key)
+                alerts[key] = current if getattr(current, 'id', current) == alert_id else alert_id
+                keys[alert_id] = key
+        finally:
+            with self._lock:
+                self._reconciling.remove(changes)
+
+        with self._lock:
+            self._alerts = alerts
+            self._keys = keys
+            # Replay the saves and deletes made while the query ran, which it may not have seen
+            for change, args in changes:
+                change(*args)
+            self._reconciled_at = started_at
+
+    def get(self, key):
+        """Return the active alert (or its id) for key, or None if there is no active alert"""
+        if time.time() - self._reconciled_at > self.RECONCILE_INTERVAL:
+            self.reconcile()
+        return self._alerts.get(key)
+
+    def _discard(self, alert_id):
+        key = self._keys.pop(alert_id, None)
+        if key is not None:
+            self._alerts.pop(key, None)
+
+    def _change(self, change, *args):
+        with self._lock:
+            change(*args)
+            for changes in self._reconciling:
+                changes.append((change, args))
+
+    def _saved(self, alert_state):
+        self._discard(alert_state.id)
+        if alert_state.active:
+            key = (alert_state.record_type, alert_state.alert_item_type_id, alert_state.alert_item_id)
+            self._alerts[key] = alert_state
+            self._keys[alert_state.id] = key
+
+    def _lowered_item(self, item_type_id, item_id):
+        for alert_id, key in self._keys.items():
+            if key[1:] == (item_type_id, item_id):
+                self._discard(alert_id)
+
+    def saved(self, alert_state):
+        self._change(self._saved, alert_state)
+
+    def deleted(self, alert_state):
+        self._change(self._discard, alert_state.id)
+
+    def lowered_item(self, item_type_id, item_id):
+        """Forget the active alerts of an item whose alerts were lowered in bulk"""
+        self._change(self._lowered_item, item_type_id, item_id)
+
+
+active_alerts = ActiveAlertIndex()
+
+
 class AlertStateBase(SparseModel):
     class Meta:
         abstract = True
@@ -170,6 +272,20 @@ class AlertStateBase(SparseModel):
             cls.default_severity, logging.WARNING)}
         return cls._notify(alert_item, active, **kwargs)
 
+    @classmethod
+    def notify_many(cls, alert_items, active, **kwargs):
+        """Notify an alert on several items in one transaction, with a savepoint per item"""
+
+        with transaction.commit_on_success():
+            for alert_item in alert_items:
+                sid = transaction.savepoint()
+                try:
+                    cls._notify(alert_item, active, **dict(kwargs))
+                    transaction.savepoint_commit(sid)
+                except DatabaseError, e:
+                    transaction.savepoint_rollback(sid)
+                    job_log.warning("AlertState: error notifying %s on %s: %s" % (cls.__name__, alert_item, e))
+
     @classmethod
     def _notify(cls, alert_item, active, **kwargs):
         if hasattr(alert_item, 'content_type'):
@@ -195,6 +311,18 @@ class AlertStateBase(SparseModel):
 
         return attrs_to_save
 
+    @classmethod
+    def _index_key(cls, alert_item, kwargs):
+        """Return the key of the alert in active_alerts, or None if the lookup can't use the index"""
+        if kwargs or getattr(cls, 'is_sparse_base', False):
+            return None
+
+        if hasattr(alert_item, 'content_type'):
+            item_type_id = alert_item.content_type_id
+        else:
+            item_type_id = ContentType.objects.get_for_model(alert_item.__class__).id
+        return (cls.__name__, item_type_id, alert_item.pk)
+
     @classmethod
     def high(cls, alert_item, **kwargs):
         if hasattr(alert_item, 'not_deleted') and alert_item.not_deleted != True:
@@ -202,8 +330,18 @@ class AlertStateBase(SparseModel):
 
         attrs_to_save = cls._get_attrs_to_save(kwargs)
 
+        key = cls._index_key(alert_item, kwargs)
+        if key is not None:
+            alert_state = active_alerts.get(key)
+            if isinstance(alert_state, AlertStateBase) and \
+                    AlertState.objects.filter(id = alert_state.id, active = True).exists():
+                # Already raised.  The indexed instance is shared, so return a copy.
+                return copy.copy(alert_state)
+
         try:
             alert_state = cls.filter_by_item(alert_item).get(**kwargs)
+            if key is not None:
+                active_alerts.saved(alert_state)
         except cls.DoesNotExist:
             kwargs.update(attrs_to_save)
 
@@ -264,6 +402,7 @@ class AlertStateBase(SparseModel):
         # Events are Alerts with no duration, so just go high/low.
         alert_state = cls.high(alert_item, attrs_to_save=kwargs)
         cls.low(alert_item, end_time=alert_state.begin, attrs_to_save=kwargs)
+        return alert_state
 
     def cast(self, target_class):
         """
@@ -322,6 +461,18 @@ class AlertSubscription(models.Model):
         return ''.join(["%s%s" % (element[0].upper(), element[1:].lower()) for element in name.split(' ')])
 
 
+@receiver(post_save)
+def _alert_saved(sender, instance, **kwargs):
+    if issubclass(sender, AlertStateBase):
+        active_alerts.saved(instance)
+
+
+@receiver(post_delete)
+def _alert_deleted(sender, instance, **kwargs):
+    if issubclass(sender, AlertStateBase):
+        active_alerts.deleted(instance)
+
+
 class AlertEmail(models.Model):
     """Record of which alerts an email has been emitted for"""
     alerts = models.ManyToManyField(AlertState)
@@ -53,6 +53,9 @@ class LogMessage(models.Model):
     tag = models.CharField(max_length = 63)
     message = models.TextField()
     message_class = models.SmallIntegerField()
+    # JSON list of (start, end, kind, id) of the hosts and targets referred to by the message,
+    # stored at ingest when LOG_SUBSTITUTIONS_AT_INGEST is set (see chroma_core.lib.log_substitution)
+    substitutions = models.TextField(null = True)
 
     @classmethod
     def get_message_class(cls, message):
@@ -3,13 +3,20 @@
 # license that can be found in the LICENSE file.
 
 
+import sys
+import heapq
 import itertools
 import collections
 import calendar
 import operator
 import functools
+import threading
+import cStringIO
+import psycopg2
+from array import array
 from datetime import datetime, timedelta
-from django.db import models
+from django.db import models, connections, transaction, DatabaseError, IntegrityError
+from django.db.models import Max, Q
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
 from django.utils.timezone import utc
@@ -27,15 +34,16 @@ def total_seconds(td):
 
 
 class SampleInfo(object):
-    def __init__(self, sample_rate, expiration_time):
+    def __init__(self, sample_rate, expiration_time, partition_interval):
         self.sample_rate = int(total_seconds(timedelta(**sample_rate)))
         self.expiration_time = timedelta(**expiration_time)
+        self.partition_interval = int(total_seconds(timedelta(**partition_interval))) if settings.STATS_PARTITIONED else 0
 
-SAMPLES = [SampleInfo({'seconds': 10}, settings.STATS_10_SECOND_EXPIRATION),
-           SampleInfo({'minutes': 1}, settings.STATS_1_MINUTE_EXPIRATION),
-           SampleInfo({'minutes': 5}, settings.STATS_5_MINUTE_EXPIRATION),
-           SampleInfo({'hours': 1}, settings.STATS_1_HOUR_EXPIRATION),
-           SampleInfo({'days': 1}, settings.STATS_1_DAY_EXPIRATION)]
+SAMPLES = [SampleInfo({'seconds': 10}, settings.STATS_10_SECOND_EXPIRATION, settings.STATS_10_SECOND_PARTITION),
+           SampleInfo({'minutes': 1}, settings.STATS_1_MINUTE_EXPIRATION, settings.STATS_1_MINUTE_PARTITION),
+           SampleInfo({'minutes': 5}, settings.STATS_5_MINUTE_EXPIRATION, settings.STATS_5_MINUTE_PARTITION),
+           SampleInfo({'hours': 1}, settings.STATS_1_HOUR_EXPIRATION, settings.STATS_1_HOUR_PARTITION),
+           SampleInfo({'days': 1}, settings.STATS_1_DAY_EXPIRATION, settings.STATS_1_DAY_PARTITION)]
 
 
 def div_samplerate(x, y):
@@ -72,14 +80,75 @@ epoch = datetime.fromtimestamp(0, utc)
 Point.zero = Point(epoch, 0.0, 0)
 
 
-class Cache(collections.defaultdict):
-    "Simple cache of limited size;  doesn't need to be LRU yet."
-    SIZE = 1e5
+POINT_SIZE = sys.getsizeof(Point.zero) + sys.getsizeof(epoch) + sys.getsizeof(0.0) + sys.getsizeof(0)
+
+
+def points_size(points):
+    "Return approximate bytes used by a sequence of points."
+    return sys.getsizeof(points) + len(points) * POINT_SIZE
+
+
+class Cache(object):
+    """Bounded least recently used cache, optionally creating missing values with a default factory.
+    Values are accounted by weight, which defaults to 1 per entry, and evicted once the total exceeds SIZE.
+    Hits, misses, and evictions are counted to help size it.  Safe to share between threads.
+    """
+    def __init__(self, default_factory=None, size=1e5, weigh=None):
+        self.lock = threading.RLock()
+        self.default_factory = default_factory
+        self.SIZE = size
+        self.weigh = weigh or (lambda value: 1)
+        self.hits = self.misses = self.evictions = 0
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.data, self.weights, self.weight = collections.OrderedDict(), {}, 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __getitem__(self, key):
+        with self.lock:
+            try:
+                value = self.data.pop(key)
+            except KeyError:
+                self.misses += 1
+                if self.default_factory is None:
+                    raise
+                value = self[key] = self.default_factory()
+                return value
+            self.hits += 1
+            self.data[key] = value
+            return value
 
     def __setitem__(self, key, value):
-        collections.defaultdict.__setitem__(self, key, value)
-        if len(self) > self.SIZE:
-            self.clear()
+        with self.lock:
+            self.data.pop(key, None)
+            self.data[key] = value
+            weight = self.weigh(value)
+            self.weight += weight - self.weights.get(key, 0)
+            self.weights[key] = weight
+            while self.weight > self.SIZE and self.data:
+                key, value = self.data.popitem(last=False)
+                self.weight -= self.weights.pop(key)
+                self.evictions += 1
+
+    def discard(self, key):
+        "Remove an entry if present;  it will be recreated on next access."
+        with self.lock:
+            if self.data.pop(key, None) is not None:
+                self.weight -= self.weights.pop(key)
+
+    def stats(self):
+        "Return counters and current size."
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self), 'weight': self.weight}
 
 
 class Series(models.Model):
@@ -98,7 +167,8 @@ class Series(models.Model):
         app_label = 'chroma_core'
         unique_together = ('content_type', 'object_id', 'name'),
 
-    cache = Cache(None)
+    cache = Cache(size=settings.STATS_SERIES_CACHE_SIZE)
+    index = Cache(size=settings.STATS_SERIES_CACHE_SIZE)  # (content type id, object id, name) -> series id
 
     @classmethod
     def get(cls, obj, name, type=''):
@@ -115,17 +185,71 @@ class Series(models.Model):
         cls.cache[obj, name] = series
         return series
 
+    @classmethod
+    def resolve(cls, obj, types):
+        """Return mapping of names to series ids for measured object, given a mapping of names to types.
+        Series missing from the index are fetched with one query, and those which don't exist are created in bulk.
+        """
+        ct = ContentType.objects.get_for_model(obj)
+        ids, missing = {}, set()
+        for name in types:
+            try:
+                ids[name] = cls.index[ct.id, obj.id, name]
+            except KeyError:
+                missing.add(name)
+        if missing:
+            query = cls.objects.filter(content_type=ct, object_id=obj.id)
+            found = dict(query.filter(name__in=missing).values_list('name', 'id'))
+            created = missing.difference(found)
+            if created:
+                assert all(types[name] in cls.DATA_TYPES + cls.JOB_TYPES for name in created)
+                sid = transaction.savepoint()
+                try:
+                    cls.objects.bulk_create(cls(content_type=ct, object_id=obj.id, name=name, type=types[name]) for name in created)
+                except IntegrityError:
+                    # created concurrently by another process
+                    transaction.savepoint_rollback(sid)
+                else:
+                    transaction.savepoint_commit(sid)
+                found.update(query.filter(name__in=created).values_list('name', 'id'))
+            for name in found:
+                ids[name] = cls.index[ct.id, obj.id, name] = found[name]
+        return ids
+
+    @classmethod
+    def cache_stats(cls):
+        "Return counters of the series cache and index of this process, for sizing them."
+        return {'Series': cls.cache.stats(), 'Series.index': cls.index.stats()}
+
+    @classmethod
+    def warm(cls):
+        "Load existing series into the index, so that resolving them needs no queries."
+        for ct_id, object_id, name, id in cls.objects.order_by('id').values_list('content_type', 'object_id', 'name', 'id').iterator():
+            cls.index[ct_id, object_id, name] = id
+
     @classmethod
     def filter(cls, obj, **kwargs):
         "Return queryset filtered for measured object."
         ct = ContentType.objects.get_for_model(obj)
         return cls.objects.filter(content_type=ct, object_id=obj.id, **kwargs)
 
+    @classmethod
+    def filter_many(cls, objs, **kwargs):
+        "Return queryset filtered for multiple measured objects."
+        object_ids = collections.defaultdict(list)
+        for obj in objs:
+            object_ids[ContentType.objects.get_for_model(obj)].append(obj.id)
+        if not object_ids:
+            return cls.objects.none()
+        query = reduce(operator.or_, (Q(content_type=ct, object_id__in=object_ids[ct]) for ct in object_ids))
+        return cls.objects.filter(query, **kwargs)
+
 
 class Sample(models.Model):
     """Abstract model for Sample tables.
     Only used for query generation.
-    Subclasses require 'step', 'expiration_time', and 'cache' attributes.
+    Subclasses require 'step', 'expiration_time', 'partition_interval', and 'cache' attributes.
+    If partitioned, points are stored in inheriting child tables which each cover a time range.
     """
     id = models.IntegerField(primary_key=True)  # for django only, not really the primary key
     dt = models.DateTimeField(db_index=True)
@@ -149,6 +273,15 @@ class Sample(models.Model):
         except OverflowError:
             return epoch
 
+    @classmethod
+    def retains(cls, ids, dt):
+        "Return whether points since datetime should still be stored for all of the series."
+        try:
+            cutoff = dt + cls.expiration_time
+        except OverflowError:
+            return True
+        return not cls.objects.filter(id__in=ids, dt__gt=cutoff).exists()
+
     @classmethod
     def floor(cls, dt):
         "Return datetime rounded down to nearest sample size."
@@ -170,10 +303,87 @@ class Sample(models.Model):
     def insert(cls, stats):
         "Bulk insert mapping of series ids to points."
         if stats:
-            cls.objects.bulk_create(cls(id, *point) for id in stats for point in stats[id])
+            cls.copy((id, point) for id in stats for point in stats[id])
         for id in stats:
             cls.cache[id] += sorted(stats[id])
 
+    @classmethod
+    def copy(cls, rows):
+        "Stream (id, point) rows into the table, or its child tables, with COPY."
+        if not cls.partition_interval:
+            return cls.copy_into(cls._meta.db_table, rows)
+        partitions = collections.defaultdict(list)
+        for row in rows:
+            partitions[cls.partition_start(row[1].dt)].append(row)
+        for start in sorted(partitions):
+            cls.copy_into(cls.partition(start), partitions[start])
+
+    @classmethod
+    def copy_into(cls, table, rows):
+        "Stream (id, point) rows into a table with COPY, reusing the model's buffer."
+        buffer = cls.buffer
+        buffer.seek(0)
+        buffer.truncate()
+        for id, (dt, sum, len) in rows:
+            buffer.write('{0:d}\t{1}\t{2!r}\t{3:d}\n'.format(id, dt.isoformat(), float(sum), len))
+        buffer.seek(0)
+        try:
+            connections[cls.objects.db].cursor().copy_from(buffer, table, columns=('id',) + Point._fields)
+        except psycopg2.IntegrityError as error:
+            # django only converts errors of execute and executemany
+            raise IntegrityError, IntegrityError(*tuple(error)), sys.exc_info()[2]
+        except psycopg2.DatabaseError as error:
+            raise DatabaseError, DatabaseError(*tuple(error)), sys.exc_info()[2]
+        transaction.commit_unless_managed(using=cls.objects.db)
+
+    @classmethod
+    def partition_start(cls, dt):
+        "Return timestamp of the start of the partition which stores the datetime."
+        return timestamp(dt) // cls.partition_interval * cls.partition_interval
+
+    @classmethod
+    def partitions(cls):
+        "Return mapping of start timestamps to names of existing child tables."
+        if cls.partition_tables is None:
+            cursor = connections[cls.objects.db].cursor()
+            cursor.execute('SELECT child.relname FROM pg_inherits '
+                           'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+                           'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent WHERE parent.relname = %s', [cls._meta.db_table])
+            cls.partition_tables = dict((int(name.rsplit('_', 1)[-1]), name) for name, in cursor)
+        return cls.partition_tables
+
+    @classmethod
+    def partition(cls, start):
+        """Return name of the child table starting at timestamp, creating it if necessary.
+        The CHECK constraint on its range lets the planner exclude it from selects outside the range.
+        """
+        partitions = cls.partitions()
+        if start not in partitions:
+            name = '{0}_{1:d}'.format(cls._meta.db_table, start)
+            bounds = [epoch + timedelta(seconds=start), epoch + timedelta(seconds=start + cls.partition_interval)]
+            cursor = connections[cls.objects.db].cursor()
+            sid = transaction.savepoint(using=cls.objects.db)
+            try:
+                cursor.execute('CREATE TABLE {0} (CHECK (dt >= %s AND dt < %s)) INHERITS ({1})'.format(name, cls._meta.db_table), bounds)
+                cursor.execute('CREATE UNIQUE INDEX {0}_id_dt ON {0} (id, dt)'.format(name))
+            except DatabaseError:
+                # created concurrently by another stats process
+                transaction.savepoint_rollback(sid, using=cls.objects.db)
+            else:
+                transaction.savepoint_commit(sid, using=cls.objects.db)
+            partitions[start] = name
+        return partitions[start]
+
+    @classmethod
+    def drop(cls, dt):
+        "Drop child tables which only store points older than datetime, and delete any such points left in the parent."
+        cursor = connections[cls.objects.db].cursor()
+        partitions = cls.partitions()
+        for start in sorted(partitions):
+            if start + cls.partition_interval <= timestamp(dt):
+                cursor.execute('DROP TABLE IF EXISTS {0}'.format(partitions.pop(start)))
+        cursor.execute('DELETE FROM ONLY {0} WHERE dt < %s'.format(cls._meta.db_table), [dt])
+
     @classmethod
     def delete(cls, **filters):
         "Delete points in bulk."
@@ -182,64 +392,194 @@ class Sample(models.Model):
         models.sql.DeleteQuery(cls).do_query(cls._meta.db_table, query.query.where, query.db)
 
     @classmethod
-    def expire(cls, ids):
-        if settings.STATS_SIMPLE_WIPE:
+    def expire(cls, ids, simple=False):
+        if simple or settings.STATS_SIMPLE_WIPE:
             "We also have a general flush added in for 2.2 which just clears everything old every so often!"
             now = datetime.now(utc)
             if now > cls.next_flush_orphans_time:
-                cls.delete(dt__lt=now - cls.expiration_time)
+                if cls.partition_interval:
+                    cls.drop(now - cls.expiration_time)
+                else:
+                    cls.delete(dt__lt=now - cls.expiration_time)
                 cls.next_flush_orphans_time = now + cls.flush_orphans_interval
         else:
             "Delete earliest points from multiple series."
-            if ids:
+            if ids and cls.partition_interval:
+                # whole partitions are shared, so only those older than every given series can be dropped
+                cls.drop(min(map(cls.start, ids)))
+            elif ids:
                 cls.delete(id__in=ids, dt__lt=min(map(cls.start, ids)))
 
 
+class Rollup(object):
+    """Columnar partial aggregates of all series for every sample model.
+    Each series is assigned a slot into parallel arrays which hold the latest raw timestamp,
+    and the timestamp, sum, and len of the open bucket of each rolled up model.
+    Samples are folded into the buckets in a single pass, and completed buckets cascade upwards.
+    At most SIZE series are kept;  past that the least recently inserted are evicted, and their
+    slots reused, down to a tenth less, so that evictions are batched.
+    """
+    def __init__(self, models, size=float('inf')):
+        self.models = models
+        self.SIZE = size
+        self.clear()
+
+    def clear(self):
+        "Discard all partial aggregates;  they will be restored from storage as series are seen again."
+        self.slots, self.ids, self.latest = {}, array('l'), array('d')
+        # generation of the last insert of each slot, and slots free for reuse
+        self.used, self.free, self.generation = array('l'), [], 0
+        # open buckets of models[1:]
+        self.dts, self.sums, self.lens = ([array(code) for model in self.models[1:]] for code in 'ddl')
+
+    def discard(self, id):
+        "Forget a series;  its slot is reused by the next series seen."
+        slot = self.slots.pop(id, None)
+        if slot is not None:
+            self.free.append(slot)
+
+    def evict(self, count, keep):
+        "Forget the count least recently inserted series, other than those to keep."
+        used = self.used
+        for generation, id in heapq.nsmallest(count, ((used[slot], id) for id, slot in self.slots.iteritems() if id not in keep)):
+            self.discard(id)
+
+    def allocate(self):
+        "Return a free slot, extending the arrays if there is none."
+        if self.free:
+            return self.free.pop()
+        for column in [self.ids, self.latest, self.used] + self.dts + self.sums + self.lens:
+            column.append(0)
+        return len(self.ids) - 1
+
+    def insert(self, samples):
+        """Fold new samples (id, dt, value) into all models.
+        Return outdated samples and lists of (id, point) to be inserted into each model.
+        """
+        samples = list(samples)
+        ids = array('l', (sample[0] for sample in samples))
+        timestamps = array('d', (total_seconds(sample[1] - epoch) for sample in samples))
+        return self.insert_columns(ids, timestamps, [sample[2] for sample in samples])
+
+    def insert_columns(self, ids, timestamps, values):
+        "Fold new samples given as parallel sequences of series ids, utc timestamps, and values, as with insert."
+        points = [[] for model in self.models]
+        seen = set(ids)
+        unseen = seen.difference(self.slots)
+        if len(self.slots) + len(unseen) > self.SIZE:
+            self.evict(len(self.slots) + len(unseen) - int(self.SIZE * 0.9), seen)
+        self.hydrate(unseen, points)
+        self.generation += 1
+        for id in seen:
+            self.used[self.slots[id]] = self.generation
+        outdated, slots, latest = [], self.slots, self.latest
+        for index in sorted(xrange(len(ids)), key=timestamps.__getitem__):
+            id, ts, value = ids[index], timestamps[index], values[index]
+            slot = slots[id]
+            dt = epoch + timedelta(seconds=ts)
+            if ts > latest[slot]:
+                latest[slot] = ts
+                points[0].append((id, Point(dt, value, 1)))
+                self.fold(slot, 0, ts, value, 1, points)
+            else:
+                outdated.append((id, dt, value))
+        return outdated, points
+
+    def fold(self, slot, index, ts, sum, count, points):
+        "Fold a point of models[index] into the open bucket of the next model, emitting the bucket when complete."
+        if index >= len(self.dts):
+            return
+        dts, sums, lens = self.dts[index], self.sums[index], self.lens[index]
+        bucket = ts - ts % self.models[index + 1].step
+        if bucket > dts[slot]:
+            if lens[slot]:
+                points[index + 1].append((self.ids[slot], Point(epoch + timedelta(seconds=dts[slot]), sums[slot], lens[slot])))
+                self.fold(slot, index + 1, dts[slot], sums[slot], lens[slot], points)
+            dts[slot], sums[slot], lens[slot] = bucket, 0.0, 0
+        if bucket == dts[slot]:
+            sums[slot] += sum
+            lens[slot] += count
+
+    def hydrate(self, ids, points):
+        """Assign slots to unseen series and restore their open buckets from stored samples.
+        Stored points which have not yet been rolled up are replayed, most coarse model first,
+        so that any buckets they complete cascade in order.
+        """
+        if not ids:
+            return
+        ids = sorted(ids)
+        latest = [dict(model.objects.filter(id__in=ids).values_list('id').annotate(Max('dt'))) for model in self.models]
+        for id in ids:
+            slot = self.slots[id] = self.allocate()
+            self.ids[slot] = id
+            self.latest[slot] = total_seconds(latest[0].get(id, epoch) - epoch)
+            for index, model in enumerate(self.models[1:]):
+                self.dts[index][slot] = total_seconds(latest[index + 1].get(id, epoch) - epoch) + model.step
+                self.sums[index][slot] = 0.0
+                self.lens[index][slot] = 0
+        for index in reversed(range(len(self.dts))):
+            model, previous = self.models[index + 1], self.models[index]
+            starts = collections.defaultdict(list)
+            for id in ids:
+                starts[latest[index + 1].get(id, epoch) + timedelta(seconds=model.step)].append(id)
+            # series usually share a few distinct starts, so one range query per start stays small
+            rows = []
+            for start in sorted(starts):
+                query = previous.objects.filter(id__in=starts[start], dt__gte=start)
+                rows += query.values_list('id', *Point._fields)
+            for id, dt, sum, count in sorted(rows):
+                self.fold(self.slots[id], index, total_seconds(dt - epoch), sum, count, points)
+
+
 class Stats(list):
     "Primary interface to all sample models."
     def __init__(self, samples):
         maxlen = max(map(div_samplerate, samples[1:], samples[:-1]))
         for sample in samples:
-            cache = Cache(functools.partial(collections.deque, maxlen=maxlen))
+            cache = Cache(functools.partial(collections.deque, maxlen=maxlen), settings.STATS_SAMPLE_CACHE_SIZE, points_size)
             namespace = {'__module__': 'chroma_core.models',
                          'step': sample.sample_rate,
                          'expiration_time': sample.expiration_time,
                          'next_flush_orphans_time': epoch,
                          'flush_orphans_interval': sample.expiration_time / settings.STATS_FLUSH_RATE,
-                         'cache': cache}
+                         'partition_interval': sample.partition_interval,
+                         'partition_tables': None,
+                         'cache': cache,
+                         'buffer': cStringIO.StringIO()}
             self.append(type('Sample_{0:d}'.format(sample.sample_rate), (Sample,), namespace))
+        self.rollup = Rollup(self, settings.STATS_ROLLUP_SIZE)
+        self.expiring = [set() for model in self]
+        self.lock = threading.Lock()
 
     def insert(self, samples):
         "Bulk insert new samples (id, dt, value).  Skip and return outdated samples."
-        # keep stats as Points grouped by id
-        outdated, stats = [], collections.defaultdict(list)
-        for id, dt, value in samples:
-            if dt > self[0].latest(id).dt:
-                stats[id].append(Point(dt, value, 1))
-            else:
-                outdated.append((id, dt, value))
-        # insert stats into first Sample and check the rest
-        self[0].insert(stats)
-        for previous, model in zip(self, self[1:]):
-            step = timedelta(seconds=model.step)
-            for id in list(stats):
-                start = model.latest(id).dt + step
-                stop = model.floor(max(stats.pop(id)).dt)
-                cache = previous.cache[id]
-                # aggregate from previous Sample as necessary
-                if start < stop:
-                    if cache and start >= cache[0].dt and stop <= cache[-1].dt:  # use cache if full
-                        points = (point for point in cache if start <= point.dt < stop and point.len)
-                    else:
-                        points = previous.select(id, dt__gte=start, dt__lt=stop)
-                    points = list(model.reduce(points))
-                    if points:
-                        stats[id] = points
-            previous.expire(stats)
+        return self.store(*self.rollup.insert(samples))
+
+    def insert_columns(self, ids, timestamps, values):
+        "Bulk insert new samples given as parallel sequences of series ids, utc timestamps, and values."
+        return self.store(*self.rollup.insert_columns(ids, timestamps, values))
+
+    def store(self, outdated, points):
+        "Insert points rolled up for each model, and return outdated samples."
+        for index, model in enumerate(self):
+            stats = collections.defaultdict(list)
+            for id, point in points[index]:
+                stats[id].append(point)
             model.insert(stats)
-        model.expire(stats)
+            with self.lock:
+                if self.expiring is not None:
+                    self.expiring[index].update(stats)
         return outdated
 
+    def expire(self, simple=False):
+        """Expire points of all series inserted since the last expiration;  run periodically off the insert path.
+        Optionally expire all points older than the expiration time, regardless of series.
+        """
+        with self.lock:
+            expiring, self.expiring = self.expiring, self.expiring and [set() for model in self]
+        for model, ids in zip(self, expiring or [()] * len(self)):
+            model.expire(ids, simple)
+
     def select(self, id, start, stop, rate=False, maxlen=float('inf'), fixed=0):
         """Return points for a series within inclusive interval of most granular samples.
         Optionally derive the rate of change of points.
@@ -251,7 +591,30 @@ class Stats(list):
             if start >= model.start(id) and model.step >= minstep:
                 break
         points = model.select(id, dt__gte=start, dt__lt=stop)
-        points = list(points if index else model.reduce(points))
+        return self.derive(points if index else model.reduce(points), start, stop, rate, fixed)
+
+    def select_many(self, ids, start, stop, rates=(), maxlen=float('inf'), fixed=0):
+        """Return mapping of series ids to points within interval, as with select, using a single range query.
+        The same sample model is used for every series;  rates are the ids of series whose rate of change is derived.
+        """
+        if not ids:
+            return {}
+        minstep = total_seconds(stop - start) / maxlen
+        for index, model in enumerate(self):
+            if model.step >= minstep and model.retains(ids, start):
+                break
+        query = model.objects.filter(id__in=ids, dt__gte=start, dt__lt=stop).order_by('id', 'dt')
+        rows = itertools.groupby(query.values_list('id', *Point._fields), key=operator.itemgetter(0))
+        selection = dict((id, [Point(*row[1:]) for row in group]) for id, group in rows)
+        result = {}
+        for id in ids:
+            points = selection.get(id, [])
+            result[id] = self.derive(points if index else model.reduce(points), start, stop, id in rates, fixed)
+        return result
+
+    def derive(self, points, start, stop, rate, fixed):
+        "Return list of selected points, optionally as rates of change and in fixed intervals."
+        points = list(points)
         if rate:
             points = map(operator.sub, points[1:], points[:-1])
         if fixed:
@@ -267,13 +630,24 @@ class Stats(list):
         point = self[0].latest(id)
         return Point(self[0].floor(point.dt), point.sum, point.len)
 
+    def reset(self, ids):
+        "Forget partial aggregates and cached points of series, e.g. after a failed insert;  they are restored from storage."
+        for id in set(ids):
+            self.rollup.discard(id)
+            for model in self:
+                model.cache.discard(id)
+
     def delete(self, id):
         "Delete all stored points for a series."
+        self.rollup.discard(id)
         for model in self:
             model.delete(id=id)
 
     def delete_all(self):
         "Delete all stored points for a series."
+        self.rollup.clear()
+        with self.lock:
+            self.expiring = [set() for model in self]
         for model in self:
             model.delete(id__gte=0)
 
@@ -75,8 +75,10 @@ def _make_deletable(metaclass, dct):
         signals.post_delete.send(sender = self.__class__, instance = self)
 
         from chroma_core.lib.job import job_log
-        from chroma_core.models.alert import AlertState
+        from django.contrib.contenttypes.models import ContentType
+        from chroma_core.models.alert import AlertState, active_alerts
         updated = AlertState.filter_by_item_id(self.__class__, self.id).update(active = None)
+        active_alerts.lowered_item(ContentType.objects.get_for_model(self.__class__).id, self.id)
         job_log.info("Lowered %d alerts while deleting %s %s" % (updated, self.__class__, self.id))
 
     def delete(self):
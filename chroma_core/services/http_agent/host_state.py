@@ -5,7 +5,8 @@
 
 import logging
 import threading
-import datetime
+import heapq
+import time
 
 from chroma_agent_comms.views import MessageView
 from chroma_core.models import ManagedHost, HostContactAlert, HostRebootEvent
@@ -36,6 +37,24 @@ class HostState(object):
         self._boot_time = boot_time
         self._client_start_time = client_start_time
 
+        # time.time() after which the host is out of contact, and whether
+        # the collection's deadline heap holds an entry for this host
+        self.deadline = None
+        self.scheduled = False
+
+        # Held while contact changes the health of the host, so that the
+        # poller can raise the contact alert and mark the host out of
+        # contact without an update landing in between
+        self.lock = threading.Lock()
+
+    @property
+    def host(self):
+        return self._host
+
+    @property
+    def healthy(self):
+        return self._healthy
+
     def update_health(self, healthy):
         HostContactAlert.notify(self._host, not healthy)
         self._healthy = healthy
@@ -45,7 +64,12 @@ class HostState(object):
         :return A boolean, true if the agent should be sent a SESSION_TERMINATE_ALL: indicates
                 whether a fresh client run (different start time) is seen.
         """
+        with self.lock:
+            return self._update(boot_time, client_start_time)
+
+    def _update(self, boot_time, client_start_time):
         self.last_contact = IMLDateTime.utcnow()
+        self.deadline = time.time() + self.CONTACT_TIMEOUT
         if boot_time is not None and boot_time != self._boot_time:
             if self._boot_time is not None:
                 HostRebootEvent.register_event(alert_item = self._host,
@@ -68,27 +92,37 @@ class HostState(object):
 
         return require_reset
 
-    def poll(self):
-        if self._healthy:
-            time_since_contact = IMLDateTime.utcnow() - self.last_contact
-            if time_since_contact > datetime.timedelta(seconds = self.CONTACT_TIMEOUT):
-                self.update_health(False)
-        return self._healthy
+    def expired(self, now):
+        """Whether the host is healthy but its deadline has passed, call with lock held"""
+        return self._healthy and now > self.deadline
+
+    def expire(self):
+        """Mark the host out of contact once its contact alert is raised, call with lock held"""
+        self._healthy = False
 
 
 class HostStateCollection(object):
     """
     Store some per-host state, things we will check and update
     without polling/continuously updating the database.
+
+    Contact deadlines are kept in a heap with at most one entry per host, so
+    that checking for timeouts only touches the hosts whose deadline is due.
     """
     def __init__(self):
+        self._lock = threading.Lock()
         self._hosts = {}
+        self._deadlines = []  # heap of (deadline, fqdn)
+        self._unhealthy = set()
 
         for mh in ManagedHost.objects.all().values('fqdn', 'boot_time'):
             self._hosts[mh['fqdn']] = HostState(mh['fqdn'], mh['boot_time'], None)
+            self._unhealthy.add(mh['fqdn'])
 
     def remove_host(self, fqdn):
-        self._hosts.pop(fqdn, None)
+        with self._lock:
+            self._hosts.pop(fqdn, None)
+            self._unhealthy.discard(fqdn)
 
     def update(self, fqdn, boot_time = None, client_start_time = None):
         try:
@@ -96,7 +130,64 @@ class HostStateCollection(object):
         except KeyError:
             state = self._hosts[fqdn] = HostState(fqdn, None, None)
 
-        return state.update(boot_time, client_start_time)
+        require_reset = state.update(boot_time, client_start_time)
+
+        with self._lock:
+            self._unhealthy.discard(fqdn)
+            if not state.scheduled:
+                state.scheduled = True
+                heapq.heappush(self._deadlines, (state.deadline, fqdn))
+
+        return require_reset
+
+    def expire(self, now = None):
+        """
+        Raise the contact alerts of the hosts whose contact deadline has passed
+        in one transaction, and mark them out of contact.
+
+        :return: A list of the HostStates which lost contact
+        """
+        if now is None:
+            now = time.time()
+
+        due = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] < now:
+                deadline, fqdn = heapq.heappop(self._deadlines)
+                state = self._hosts.get(fqdn)
+                if state is None:
+                    continue
+                if state.deadline > deadline:
+                    # Contacted since this entry was pushed
+                    heapq.heappush(self._deadlines, (state.deadline, fqdn))
+                    continue
+
+                state.scheduled = False
+                due.append(state)
+
+        # Hold the hosts' locks from checking the deadline until they are marked
+        # out of contact, so that contact in between cannot leave an alert raised
+        # on a healthy host.  update() only ever takes one of these locks.
+        due.sort(key = lambda state: state.fqdn)
+        for state in due:
+            state.lock.acquire()
+        try:
+            expired = [state for state in due if state.expired(now)]
+            if expired:
+                HostContactAlert.notify_many([state.host for state in expired], True)
+            for state in expired:
+                state.expire()
+            with self._lock:
+                self._unhealthy.update(state.fqdn for state in expired)
+        finally:
+            for state in due:
+                state.lock.release()
+
+        return expired
+
+    def unhealthy_fqdns(self):
+        with self._lock:
+            return set(self._unhealthy)
 
     def items(self):
         return self._hosts.items()
@@ -104,8 +195,9 @@ class HostStateCollection(object):
 
 class HostStatePoller(object):
     """
-    This thread periodically calls the .poll method of all the
-    hosts in a collection, in order to generate timeouts.
+    This thread periodically expires the hosts in a collection whose
+    contact deadline has passed, in order to generate timeouts, and
+    resets the sessions of all the out of contact hosts in one pass.
     """
 
     # How often to wake up and update alerts
@@ -124,12 +216,15 @@ class HostStatePoller(object):
         self._stopping.wait(self.STARTUP_DELAY)
 
         while not self._stopping.is_set():
-            for fqdn, host_state in self._hosts.items():
-                healthy = host_state.poll()
-                if not healthy:
-                    self._sessions.reset_fqdn_sessions(host_state.fqdn)
-
+            self.poll()
             self._stopping.wait(self.POLL_INTERVAL)
 
+    def poll(self, now = None):
+        self._hosts.expire(now)
+
+        unhealthy = self._hosts.unhealthy_fqdns()
+        if unhealthy:
+            self._sessions.reset_fqdns_sessions(unhealthy)
+
     def stop(self):
         self._stopping.set()
@@ -3,8 +3,11 @@
 # license that can be found in the LICENSE file.
 
 
+import time
 import Queue
 import threading
+import collections
+from chroma_core.lib.util import cooperative_event
 from chroma_core.services import _amqp_connection, log_register
 from chroma_core.services.queue import ServiceQueue
 
@@ -47,12 +50,43 @@ class HostQueueCollection(object):
         self.plugin_rx_queue.put(message)
 
 
+class HostTxQueue(object):
+    """FIFO of messages to a single host, with the get/put interface of Queue.Queue.
+    Readers are serialized by HostQueues.tx_lock, so at most one GET waits here."""
+    def __init__(self):
+        self._messages = collections.deque()
+        self._ready = cooperative_event()
+
+    def put(self, message):
+        self._messages.append(message)
+        self._ready.set()
+
+    def get(self, block=True, timeout=None):
+        if block and not self._messages:
+            deadline = None if timeout is None else time.time() + timeout
+            while not self._messages:
+                self._ready.clear()
+                if self._messages:
+                    break
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._ready.wait(remaining)
+        try:
+            return self._messages.popleft()
+        except IndexError:
+            raise Queue.Empty()
+
+    def qsize(self):
+        return len(self._messages)
+
+
 class HostQueues(object):
     """Both directions of messages for a single host"""
     def __init__(self, fqdn):
         self.fqdn = fqdn
         self.rx = Queue.Queue()
-        self.tx = Queue.Queue()
+        self.tx = HostTxQueue()
         self.tx_lock = threading.Lock()
 
 
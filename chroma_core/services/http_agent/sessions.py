@@ -94,10 +94,16 @@ class SessionCollection(object):
          * the RX direction, to tell services that an agent session has gone away
          * the TX direction, to tell the agent that we left it for dead, if it comes back.
         """
+        self.reset_fqdns_sessions(set([victim_fqdn]))
+
+    def reset_fqdns_sessions(self, victim_fqdns):
+        """
+        As reset_fqdn_sessions, for a set of hosts in one pass over the sessions.
+        """
         with self._lock:
             remove_keys = []
             for (fqdn, plugin), session in self._sessions.items():
-                if fqdn == victim_fqdn:
+                if fqdn in victim_fqdns:
                     log.info("Terminating session %s/%s/%s" % (fqdn, plugin, session.id))
                     self._queues.receive({
                         'fqdn': fqdn,
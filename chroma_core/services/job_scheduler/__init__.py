@@ -26,7 +26,11 @@ log = log_register(__name__)
 class QueueHandler(object):
     """Service ModificationNotificationQueue and call into JobScheduler on message
 
+    Messages are consumed in batches of up to MAX_BATCH, of which only the latest
+    notification of each set of attributes of an object is applied.
     """
+    MAX_BATCH = 256
+
     def __init__(self, job_scheduler):
         self._queue = job_scheduler_notify.NotificationQueue()
         self._queue.purge()
@@ -37,38 +41,62 @@ class QueueHandler(object):
 
     def run(self):
         # Disregard any old messages
-        self._queue.serve(self.on_message)
+        self._queue.serve_batch(self.on_messages, self.MAX_BATCH)
 
     def on_message(self, message):
-        try:
-            # Deserialize any datetimes which were serialized for JSON
-            deserialized_update_attrs = {}
-            model_klass = ContentType.objects.get_by_natural_key(*message['instance_natural_key']).model_class()
-            for attr, value in message['update_attrs'].items():
-                try:
-                    field = [f for f in model_klass._meta.fields if f.name == attr][0]
-                except IndexError:
-                    # e.g. _id names, they aren't datetimes so ignore them
-                    deserialized_update_attrs[attr] = value
+        self.on_messages([message])
+
+    def _deserialize(self, message):
+        # Deserialize any datetimes which were serialized for JSON
+        deserialized_update_attrs = {}
+        model_klass = ContentType.objects.get_by_natural_key(*message['instance_natural_key']).model_class()
+        for attr, value in message['update_attrs'].items():
+            try:
+                field = [f for f in model_klass._meta.fields if f.name == attr][0]
+            except IndexError:
+                # e.g. _id names, they aren't datetimes so ignore them
+                deserialized_update_attrs[attr] = value
+            else:
+                if isinstance(field, DateTimeField):
+                    deserialized_update_attrs[attr] = IMLDateTime.parse(value)
                 else:
-                    if isinstance(field, DateTimeField):
-                        deserialized_update_attrs[attr] = IMLDateTime.parse(value)
-                    else:
-                        deserialized_update_attrs[attr] = value
-
-            log.debug("on_message: %s %s" % (message, deserialized_update_attrs))
-
-            self._job_scheduler.notify(
-                message['instance_natural_key'],
-                message['instance_id'],
-                message['time'],
-                deserialized_update_attrs,
-                message['from_states']
-            )
-        except:
-            # Log bad messages and continue, swallow the exception to avoid
-            # bringing down the whole service
-            log.warning("on_message: bad message: %s" % traceback.format_exc())
+                    deserialized_update_attrs[attr] = value
+
+        log.debug("on_message: %s %s" % (message, deserialized_update_attrs))
+
+        return (
+            message['instance_natural_key'],
+            message['instance_id'],
+            IMLDateTime.parse(message['time']),
+            deserialized_update_attrs,
+            message['from_states']
+        )
+
+    def on_messages(self, messages):
+        latest = {}
+        for message in messages:
+            try:
+                notification = self._deserialize(message)
+            except:
+                # Log bad messages and continue, swallow the exception to avoid
+                # bringing down the whole service
+                log.warning("on_message: bad message: %s" % traceback.format_exc())
+                continue
+
+            # Later notifications of the same attributes of an object supersede earlier ones
+            content_type, object_id, notification_time, update_attrs, from_states = notification
+            key = (tuple(content_type), object_id, tuple(sorted(update_attrs.keys())), tuple(from_states))
+            if key not in latest or latest[key][2] <= notification_time:
+                latest[key] = notification
+
+        if len(latest) < len(messages):
+            log.debug("on_messages: coalesced %d messages into %d notifications" % (len(messages), len(latest)))
+
+        if latest:
+            try:
+                self._job_scheduler.notify_many(sorted(latest.values(), key = lambda notification: notification[2]))
+            except:
+                log.warning("on_messages: error applying notifications: %s" % traceback.format_exc())
 
 
 class Service(ChromaService):
@@ -99,6 +127,13 @@ class Service(ChromaService):
         self._rpc_thread.start()
         self._progress_thread.start()
 
+        # This thread feeds long polling with changes notified by database triggers
+        self._listener_thread = None
+        if settings.LONG_POLLING_NOTIFY:
+            from chroma_core.lib.long_polling.long_polling import TableChangeListener
+            self._listener_thread = ServiceThread(TableChangeListener())
+            self._listener_thread.start()
+
         self._children_started.set()
         self._mail_alerts_thread = MailAlerts(settings.EMAIL_SENDER,
                                               settings.EMAIL_SUBJECT_PREFIX,
@@ -130,6 +165,8 @@ class Service(ChromaService):
         self._queue_thread.stop()
         self._progress_thread.stop()
         self._mail_alerts_thread.stop()
+        if self._listener_thread:
+            self._listener_thread.stop()
 
         self.log.info("Joining...")
         self._rpc_thread.join()
@@ -137,6 +174,8 @@ class Service(ChromaService):
         self._job_scheduler.join_run_threads()
         self._progress_thread.join()
         self._mail_alerts_thread.join()
+        if self._listener_thread:
+            self._listener_thread.join()
 
         self.log.info("Complete.")
 
@@ -349,6 +349,10 @@ class RunJobThread(threading.Thread):
 
 
 class JobCollection(object):
+    """Jobs of incomplete commands, by state.  Pending jobs are tracked by the set of
+    jobs they still wait for, with reverse edges from each job to its waiters, so that
+    completing a job makes its waiters ready without rescanning the pending jobs.
+    """
     def __init__(self):
         self.flush()
 
@@ -364,10 +368,40 @@ class JobCollection(object):
         self._command_to_jobs = defaultdict(set)
         self._job_to_commands = defaultdict(set)
 
+        self._waiting = {}  # Map of pending job ID to IDs of incomplete jobs it waits for
+        self._waiters = defaultdict(set)  # Map of job ID to IDs of pending jobs waiting for it
+        self._ready = {}  # Map of job ID to pending jobs which wait for nothing
+
     def add(self, job):
         self._jobs[job.id] = job
         self._state_jobs[job.state][job.id] = job
 
+        if job.state == 'pending' and job.id not in self._waiting and job.id not in self._ready:
+            wait_for_ids = set(json.loads(job.wait_for_json)) - set(self._state_jobs['complete'])
+            if wait_for_ids:
+                self._waiting[job.id] = wait_for_ids
+                for wait_for_id in wait_for_ids:
+                    self._waiters[wait_for_id].add(job.id)
+            else:
+                self._ready[job.id] = job
+
+    def _left(self, job_id, initial_state):
+        """Update dependency tracking for a job which has left `initial_state`"""
+        if initial_state == 'pending':
+            self._ready.pop(job_id, None)
+            self._waiting.pop(job_id, None)
+
+    def _completed(self, job_id):
+        """Update dependency tracking for a job which has become complete"""
+        for waiter_id in self._waiters.pop(job_id, ()):
+            wait_for_ids = self._waiting.get(waiter_id)
+            if wait_for_ids is None:
+                continue
+            wait_for_ids.discard(job_id)
+            if not wait_for_ids:
+                del self._waiting[waiter_id]
+                self._ready[waiter_id] = self._jobs[waiter_id]
+
     def add_command(self, command, jobs):
         """Add command if it doesn't already exist, and ensure that all
         of `jobs` are associated with it
@@ -397,6 +431,9 @@ class JobCollection(object):
             log.warning("Cancelling uncached Job %s" % job.id)
         else:
             self._state_jobs[job.state][job.id] = job
+            self._left(job.id, initial_state)
+            if job.state == 'complete':
+                self._completed(job.id)
 
     def update_commands(self, job):
         """
@@ -418,20 +455,22 @@ class JobCollection(object):
 
     def update_many(self, jobs, new_state):
         for job in jobs:
+            initial_state = job.state
             del self._state_jobs[job.state][job.id]
             job.state = new_state
             self._state_jobs[job.state][job.id] = job
+            self._left(job.id, initial_state)
+            if job.state == 'complete':
+                self._completed(job.id)
 
         Job.objects.filter(id__in = [j.id for j in jobs]).update(state = new_state)
 
     @property
     def ready_jobs(self):
-        result = []
-        for job in self._state_jobs['pending'].values():
-            wait_for_ids = json.loads(job.wait_for_json)
-            complete_job_ids = [j.id for j in self._state_jobs['complete'].values()]
-            if not set(wait_for_ids) - set(complete_job_ids):
-                result.append(job)
+        """Pending jobs whose wait_for jobs are all complete, in the order they were created.
+        Jobs leave this set when they are tasked or completed, so each call only returns
+        jobs which became ready since the last call's jobs were run."""
+        result = [self._ready[job_id] for job_id in sorted(self._ready)]
 
         if len(result) == 0 and len(self.pending_jobs) == 0 and len(self.tasked_jobs) == 0:
             # A quiescent state, flush the collection (avoid building up an indefinitely
@@ -494,6 +533,7 @@ class JobScheduler(object):
             len(ready_jobs),
             len(self._job_collection.pending_jobs),
             len(self._job_collection.tasked_jobs)))
+        log.debug("run_next: lock cache lookups %s" % dict(self._lock_cache.lookups))
 
         dep_cache = DepCache()
         ok_jobs, cancel_jobs = self._check_jobs(ready_jobs, dep_cache)
@@ -790,9 +830,24 @@ class JobScheduler(object):
 
     @transaction.commit_on_success
     def notify(self, content_type, object_id, time_serialized, update_attrs, from_states):
+        self.notify_many([(content_type, object_id, IMLDateTime.parse(time_serialized), update_attrs, from_states)])
+
+    @transaction.commit_on_success
+    def notify_many(self, notifications):
+        """Apply a batch of notifications, then schedule once, in one transaction.
+
+        :param notifications: List of (content_type, object_id, notification_time, update_attrs, from_states)
+        """
         with self._lock:
-            notification_time = IMLDateTime.parse(time_serialized)
-            self._notify(content_type, object_id, notification_time, update_attrs, from_states)
+            for notification in notifications:
+                sid = transaction.savepoint()
+                try:
+                    self._notify(*notification)
+                except Exception:
+                    transaction.savepoint_rollback(sid)
+                    log.error("notify: error applying %s: %s" % (notification, traceback.format_exc()))
+                else:
+                    transaction.savepoint_commit(sid)
 
             self._run_next()
 
@@ -3,11 +3,39 @@
 # license that can be found in the LICENSE file.
 
 
-from collections import defaultdict
+from collections import defaultdict, Counter
+from bisect import bisect_left, bisect_right
 import json
 from django.db.models import Q
 
 
+class LocksByJob(list):
+    """Locks on one item, ordered by job id (and by insertion within a job), with
+    a parallel list of job ids so that insertions and removals are found by bisection
+    and the latest lock is always the last.
+    """
+
+    def __init__(self):
+        super(LocksByJob, self).__init__()
+        self.job_ids = []
+
+    def add(self, lock):
+        index = bisect_right(self.job_ids, lock.job.id)
+        self.job_ids.insert(index, lock.job.id)
+        self.insert(index, lock)
+
+    def discard(self, lock):
+        for index in xrange(bisect_left(self.job_ids, lock.job.id), bisect_right(self.job_ids, lock.job.id)):
+            if self[index] is lock:
+                del self.job_ids[index]
+                del self[index]
+                return
+
+    def after(self, job_id):
+        "Return locks of jobs with id of at least `job_id`"
+        return self[bisect_left(self.job_ids, job_id):]
+
+
 class LockCache(object):
 
     # Lock change receivers are called whenever a change occurs to the locks. It allows something to
@@ -20,12 +48,13 @@ class LockCache(object):
     def __init__(self):
         from chroma_core.models import Job, StateLock
 
-        self.write_locks = []
-        self.write_by_item = defaultdict(list)
-        self.read_locks = []
-        self.read_by_item = defaultdict(list)
+        self.write_by_item = defaultdict(LocksByJob)
+        self.read_by_item = defaultdict(LocksByJob)
         self.all_by_job = defaultdict(list)
-        self.all_by_item = defaultdict(list)
+        self.all_by_item = defaultdict(LocksByJob)
+
+        # Number of calls to each lookup method, to show the load of lock queries
+        self.lookups = Counter()
 
         for job in Job.objects.filter(~Q(state = 'complete')):
             if job.locks_json:
@@ -37,20 +66,23 @@ class LockCache(object):
         for lock_change_receiver in self.lock_change_receivers:
             lock_change_receiver(lock, add_remove)
 
+    def _discard(self, by_item, lock):
+        locks = by_item.get(lock.locked_item)
+        if locks is not None:
+            locks.discard(lock)
+            if not locks:
+                del by_item[lock.locked_item]
+
     def remove_job(self, job):
-        locks = list(self.all_by_job[job.id])
-        n = len(locks)
+        locks = self.all_by_job.pop(job.id, [])
         for lock in locks:
             if lock.write:
-                self.write_locks.remove(lock)
-                self.write_by_item[lock.locked_item].remove(lock)
+                self._discard(self.write_by_item, lock)
             else:
-                self.read_locks.remove(lock)
-                self.read_by_item[lock.locked_item].remove(lock)
-            self.all_by_job[job.id].remove(lock)
-            self.all_by_item[lock.locked_item].remove(lock)
+                self._discard(self.read_by_item, lock)
+            self._discard(self.all_by_item, lock)
             self.call_receivers(lock, self.LOCK_REMOVE)
-        return n
+        return len(locks)
 
     def add(self, lock):
         self._add(lock)
@@ -59,46 +91,44 @@ class LockCache(object):
         assert lock.job.id is not None
 
         if lock.write:
-            self.write_locks.append(lock)
-            self.write_by_item[lock.locked_item].append(lock)
+            self.write_by_item[lock.locked_item].add(lock)
         else:
-            self.read_locks.append(lock)
-            self.read_by_item[lock.locked_item].append(lock)
+            self.read_by_item[lock.locked_item].add(lock)
 
         self.all_by_job[lock.job.id].append(lock)
-        self.all_by_item[lock.locked_item].append(lock)
+        self.all_by_item[lock.locked_item].add(lock)
         self.call_receivers(lock, self.LOCK_ADD)
 
     def get_by_job(self, job):
+        self.lookups['get_by_job'] += 1
         return self.all_by_job[job.id]
 
     def get_all(self, locked_item):
+        self.lookups['get_all'] += 1
         return self.all_by_item[locked_item]
 
     def get_latest_write(self, locked_item, not_job = None):
-        try:
-            if not_job != None:
-                return sorted([l for l in self.write_by_item[locked_item] if l.job != not_job], lambda a, b: cmp(a.job.id, b.job.id))[-1]
-            else:
-                return sorted(self.write_by_item[locked_item], lambda a, b: cmp(a.job.id, b.job.id))[-1]
-        except IndexError:
-            return None
+        self.lookups['get_latest_write'] += 1
+        for lock in reversed(self.write_by_item.get(locked_item, ())):
+            if not_job is None or lock.job != not_job:
+                return lock
+        return None
 
     def get_read_locks(self, locked_item, after, not_job):
-        return [x for x in self.read_by_item[locked_item] if after <= x.job.id and x.job != not_job]
+        self.lookups['get_read_locks'] += 1
+        return [x for x in self.read_by_item.get(locked_item, LocksByJob()).after(after) if x.job != not_job]
 
     def get_write(self, locked_item):
+        self.lookups['get_write'] += 1
         return self.write_by_item[locked_item]
 
     def get_by_locked_item(self, item):
+        self.lookups['get_by_locked_item'] += 1
         return self.all_by_item[item]
 
     def get_write_by_locked_item(self):
-        result = {}
-        for locked_item, locks in self.write_by_item.items():
-            if locks:
-                result[locked_item] = sorted(locks, lambda a, b: cmp(a.job.id, b.job.id))[-1]
-        return result
+        self.lookups['get_write_by_locked_item'] += 1
+        return dict((locked_item, locks[-1]) for locked_item, locks in self.write_by_item.items() if locks)
 
 
 def lock_change_receiver():
@@ -4,28 +4,134 @@
 
 
 import traceback
+import threading
+import Queue
+import time
 import sys
 from chroma_core.services.lustre_audit.update_scan import UpdateScan
-from chroma_core.models import ManagedHost
-from chroma_core.services import ChromaService, log_register
+from chroma_core.models import ManagedHost, Series
+from chroma_core.services import ChromaService, ServiceThread, log_register
 from chroma_core.services.queue import AgentRxQueue
+from chroma_core.services.rpc import ServiceRpcInterface
+from django import db
 from django.db import transaction
 
+import settings
+
 
 log = log_register(__name__)
 
 
+class LustreAuditRpc(ServiceRpcInterface):
+    methods = ['audit_status', 'cache_stats']
+
+
+class AuditDispatcher(object):
+    """Hands the latest report of each host to a pool of workers, processing at most one
+    report of a host at a time so that each host's reports are applied in order.  A report
+    which is superseded by a newer one from the same host while it waits is dropped.
+    """
+    def __init__(self, callback):
+        self._callback = callback
+        self._lock = threading.Lock()
+        self._reports = {}  # Map of fqdn to (report, time received) of its waiting report
+        self._busy = set()  # fqdns whose report is being processed
+        self._ready = Queue.Queue()  # fqdns with a waiting report which are not busy
+        self.dropped = 0
+        self.lags = {}  # Map of fqdn to seconds from receipt to completion of its last report
+
+    def put(self, fqdn, data):
+        with self._lock:
+            if fqdn in self._reports:
+                self.dropped += 1
+            elif fqdn not in self._busy:
+                self._ready.put(fqdn)
+            self._reports[fqdn] = (data, time.time())
+
+    def process(self, timeout):
+        "Process the waiting report of one host, if one is ready within `timeout` seconds"
+        try:
+            fqdn = self._ready.get(timeout = timeout)
+        except Queue.Empty:
+            return
+
+        with self._lock:
+            data, received_at = self._reports.pop(fqdn)
+            self._busy.add(fqdn)
+        try:
+            self._callback(fqdn, data)
+        finally:
+            with self._lock:
+                self._busy.discard(fqdn)
+                self.lags[fqdn] = time.time() - received_at
+                if fqdn in self._reports:
+                    self._ready.put(fqdn)
+
+    def status(self):
+        with self._lock:
+            now = time.time()
+            return {
+                'waiting': dict((fqdn, now - received_at) for fqdn, (data, received_at) in self._reports.items()),
+                'busy': list(self._busy),
+                'dropped': self.dropped,
+                'lags': dict(self.lags)
+            }
+
+
+class AuditWorker(object):
+    def __init__(self, dispatcher):
+        self._dispatcher = dispatcher
+        self._stopping = threading.Event()
+
+    def run(self):
+        while not self._stopping.is_set():
+            self._dispatcher.process(timeout = 1)
+        db.connection.close()
+
+    def stop(self):
+        self._stopping.set()
+
+
 class Service(ChromaService):
     PLUGIN_NAME = 'lustre'
 
     def __init__(self):
         self._queue = AgentRxQueue(Service.PLUGIN_NAME)
         self._queue.purge()
+        self._dispatcher = AuditDispatcher(self.on_data)
+
+    def audit_status(self):
+        """Return the number of messages queued, and for each host the seconds its waiting report
+        has waited, the seconds its last report took from receipt to completion, and the number
+        of reports dropped because a newer one arrived."""
+        status = self._dispatcher.status()
+        status['queued'] = self._queue.qsize()
+        return status
+
+    def cache_stats(self):
+        "Return counters of the series cache and index, which metrics are resolved through, for sizing them."
+        return Series.cache_stats()
 
     def run(self):
         super(Service, self).run()
 
-        self._queue.serve(data_callback = self.on_data)
+        # metrics are serialized here, so resolve their series without queries
+        Series.warm()
+
+        worker_threads = [ServiceThread(AuditWorker(self._dispatcher)) for i in range(settings.LUSTRE_AUDIT_WORKERS)]
+        for thread in worker_threads:
+            thread.start()
+
+        # This thread services audit status RPCs
+        rpc_thread = ServiceThread(LustreAuditRpc(self))
+        rpc_thread.start()
+
+        self._queue.serve(data_callback = self._dispatcher.put)
+
+        for thread in worker_threads + [rpc_thread]:
+            thread.stop()
+        for thread in worker_threads + [rpc_thread]:
+            thread.join()
 
     def on_data(self, fqdn, data):
         with transaction.commit_manually():
@@ -8,7 +8,6 @@ import json
 from chroma_core.services import log_register
 
 from django.db import transaction
-from django.db.models import Q
 
 from chroma_core.models.target import ManagedTarget, TargetRecoveryInfo, TargetRecoveryAlert
 from chroma_core.models.host import ManagedHost, VolumeNode
@@ -17,6 +16,7 @@ from chroma_core.models.filesystem import ManagedFilesystem
 from chroma_core.services.job_scheduler import job_scheduler_notify
 from chroma_core.services.job_scheduler.job_scheduler_client import JobSchedulerClient
 from chroma_core.models import ManagedTargetMount
+from chroma_core.lib.cache import ReloadingIndex
 from iml_common.lib.date_time import IMLDateTime
 from iml_common.lib.package_version_info import VersionInfo
 from chroma_core.services.stats import StatsQueue
@@ -25,6 +25,50 @@ from chroma_core.services.stats import StatsQueue
 log = log_register(__name__)
 
 
+def changes(current, update_attrs):
+    """Whether a notification of update_attrs would change any of the current values, so
+    that audits reporting what the database already holds send nothing.  `current` maps
+    attribute names to values, as an instance's __dict__ or a values() row does."""
+    return any(current[attr] != value for attr, value in update_attrs.items())
+
+
+class TargetIndex(ReloadingIndex):
+    """Ids of targets by ha_label, hosts by node name or fqdn, and target mounts by target
+    and host, for resolving resource locations without a query each.  Remembering missed
+    keys matters here, because hosts also report resources which are not targets, such
+    as stonith devices.
+    """
+    def __init__(self):
+        super(TargetIndex, self).__init__()
+        self._targets = {}
+        self._hosts = {}
+        self._mounts = {}
+
+    def _load(self):
+        self._targets = dict((ha_label, (target_id, immutable_state)) for target_id, ha_label, immutable_state
+                             in ManagedTarget.objects.values_list('id', 'ha_label', 'immutable_state'))
+        hosts = {}
+        for host_id, nodename, fqdn in ManagedHost.objects.values_list('id', 'nodename', 'fqdn'):
+            hosts[nodename] = host_id
+            hosts[fqdn] = host_id
+        self._hosts = hosts
+        self._mounts = dict(((target_id, host_id), mount_id) for mount_id, target_id, host_id
+                            in ManagedTargetMount.objects.values_list('id', 'target_id', 'host_id'))
+
+    def target(self, ha_label):
+        "Return (id, immutable_state) of the target"
+        return self._lookup('_targets', ha_label)
+
+    def host(self, node_name):
+        return self._lookup('_hosts', node_name)
+
+    def mount(self, target_id, host_id):
+        return self._lookup('_mounts', (target_id, host_id))
+
+
+target_index = TargetIndex()
+
+
 class UpdateScan(object):
     def __init__(self):
         self.audited_mountables = {}
@@ -190,7 +234,7 @@ class UpdateScan(object):
         # Loop over all mountables we expected on this host, whether they
         # were actually seen in the results or not.
         mounted_uuids = dict([(m['fs_uuid'], m) for m in self.host_data['mounts']])
-        for target_mount in ManagedTargetMount.objects.filter(host = self.host):
+        for target_mount in ManagedTargetMount.objects.filter(host = self.host).select_related('target'):
 
             # Mounted-ness
             # ============
@@ -209,11 +253,13 @@ class UpdateScan(object):
             if target_mount.target.immutable_state:
                 target = target_mount.target
                 if mounted_locally:
-                    job_scheduler_notify.notify(target, self.started_at, {
+                    update_attrs = {
                         'state': 'mounted',
                         'active_mount_id': target_mount.id
-                    }, ['mounted', 'unmounted'])
-                elif not mounted_locally and target.active_mount == target_mount:
+                    }
+                    if changes(target.__dict__, update_attrs):
+                        job_scheduler_notify.notify(target, self.started_at, update_attrs, ['mounted', 'unmounted'])
+                elif not mounted_locally and target.active_mount_id == target_mount.id:
                     log.debug("clearing active_mount, %s %s", self.started_at, self.host)
 
                     job_scheduler_notify.notify(target, self.started_at, {
@@ -249,33 +295,48 @@ class UpdateScan(object):
                                                                           crm_mon_error['stderr']))
             return
 
+        locations = []
         for resource_name, node_name in self.host_data['resource_locations'].items():
             try:
-                target = ManagedTarget.objects.get(ha_label = resource_name)
-            except ManagedTarget.DoesNotExist:
+                target_id, immutable_state = target_index.target(resource_name)
+            except KeyError:
                 # audit_log.warning("Resource %s on host %s is not a known target" % (resource_name, self.host))
                 continue
+            locations.append((resource_name, node_name, target_id, immutable_state))
+
+        # The current values of the targets, to notify only those whose location changed
+        current = dict((values['id'], values) for values in ManagedTarget.objects.filter(
+            id__in = [location[2] for location in locations]).values('id', 'state', 'active_mount_id'))
+
+        for resource_name, node_name, target_id, immutable_state in locations:
 
             # If we're operating on a Managed* rather than a purely monitored target
-            if not target.immutable_state:
+            if not immutable_state:
                 if node_name is None:
-                    active_mount = None
+                    active_mount_id = None
                 else:
                     try:
-                        host = ManagedHost.objects.get(Q(nodename=node_name) | Q(fqdn=node_name))
+                        host_id = target_index.host(node_name)
                         try:
-                            active_mount = ManagedTargetMount.objects.get(target = target, host = host)
-                        except ManagedTargetMount.DoesNotExist:
-                            log.warning("Resource for target '%s' is running on host '%s', but there is no such TargetMount" % (target, host))
-                            active_mount = None
-                    except ManagedHost.DoesNotExist:
+                            active_mount_id = target_index.mount(target_id, host_id)
+                        except KeyError:
+                            log.warning("Resource for target '%s' is running on host '%s', but there is no such TargetMount" % (resource_name, node_name))
+                            active_mount_id = None
+                    except KeyError:
                         log.warning("Resource location node '%s' does not match any Host" % (node_name))
-                        active_mount = None
-
-                job_scheduler_notify.notify(target, self.started_at, {
-                    'state': ['unmounted', 'mounted'][active_mount != None],
-                    'active_mount_id': None if active_mount is None else active_mount.id
-                }, ['mounted', 'unmounted'])
+                        active_mount_id = None
+
+                update_attrs = {
+                    'state': ['unmounted', 'mounted'][active_mount_id != None],
+                    'active_mount_id': active_mount_id
+                }
+                if target_id not in current:
+                    # Removed since the index was loaded
+                    target_index.reload()
+                    continue
+                if changes(current[target_id], update_attrs):
+                    target = ManagedTarget.objects.get(id = target_id)
+                    job_scheduler_notify.notify(target, self.started_at, update_attrs, ['mounted', 'unmounted'])
 
     def store_lustre_target_metrics(self, target_name, metrics):
         # TODO: Re-enable MGS metrics storage if it turns out it's useful.
@@ -37,6 +37,11 @@ class AgentPluginHandlerCollection(object):
         candidates = Volume.objects.filter(volumenode__host__id=host_id).distinct()
         self.resource_manager.balance_unweighted_volume_nodes(candidates)
 
+    def cache_stats(self):
+        "Return counters of the series cache and index, which storage resource metrics are resolved through, for sizing them."
+        from chroma_core.models import Series
+        return Series.cache_stats()
+
 
 class Service(ChromaService):
     def __init__(self):
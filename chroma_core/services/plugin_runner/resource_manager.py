@@ -14,6 +14,7 @@ import json
 import threading
 
 from collections import defaultdict
+from contextlib import contextmanager
 
 import dse
 from django.db.models.aggregates import Count
@@ -58,6 +59,73 @@ class PluginSession(object):
         self.update_period = update_period
 
 
+class ScopeLocks(object):
+    """
+    Locks for ResourceManager operations.  An operation within one scope (the
+    records of a session's scannable_id) holds the global lock shared with
+    operations in other scopes, and that scope's own lock.  An operation which
+    may touch records of more than one scope holds the global lock exclusively.
+
+    Both are reentrant within a thread, but a thread holding a scope lock may
+    not go on to take the exclusive lock: that would deadlock against another
+    thread doing the same.
+    """
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        # Map of thread to number of times it holds the global lock shared
+        self._shared = defaultdict(int)
+        self._exclusive = None
+        self._exclusive_count = 0
+        self._exclusive_waiting = 0
+        self._scope_locks = defaultdict(threading.RLock)
+
+    @contextmanager
+    def scope(self, scannable_id):
+        me = threading.current_thread()
+        with self._condition:
+            if self._exclusive is not me and me not in self._shared:
+                # Let waiting exclusive operations go first so they are not starved
+                while self._exclusive is not None or self._exclusive_waiting:
+                    self._condition.wait()
+            self._shared[me] += 1
+            scope_lock = self._scope_locks[scannable_id]
+
+        try:
+            with scope_lock:
+                yield
+        finally:
+            with self._condition:
+                self._shared[me] -= 1
+                if not self._shared[me]:
+                    del self._shared[me]
+                    self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        me = threading.current_thread()
+        with self._condition:
+            if self._exclusive is not me:
+                if me in self._shared:
+                    raise RuntimeError("Cannot take the exclusive lock while holding a scope lock")
+                self._exclusive_waiting += 1
+                try:
+                    while self._exclusive is not None or self._shared:
+                        self._condition.wait()
+                finally:
+                    self._exclusive_waiting -= 1
+                self._exclusive = me
+            self._exclusive_count += 1
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive_count -= 1
+                if not self._exclusive_count:
+                    self._exclusive = None
+                    self._condition.notify_all()
+
+
 class EdgeIndex(object):
     def __init__(self):
         # Define: Edges go 'from' child 'to' parent
@@ -66,30 +134,38 @@ class EdgeIndex(object):
         # Map of 'to' to (from, to)
         self._parent_to_edge = defaultdict(set)
 
+        # Sessions in different scopes may add edges to the same parent concurrently
+        self._lock = threading.RLock()
+
     def get_parents(self, child):
-        return [e[1] for e in self._parent_from_edge[child]]
+        with self._lock:
+            return [e[1] for e in self._parent_from_edge[child]]
 
     def get_children(self, parent):
-        return [e[0] for e in self._parent_to_edge[parent]]
+        with self._lock:
+            return [e[0] for e in self._parent_to_edge[parent]]
 
     def add_parent(self, child, parent):
         edge = (child, parent)
-        self._parent_from_edge[child].add(edge)
-        self._parent_to_edge[parent].add(edge)
+        with self._lock:
+            self._parent_from_edge[child].add(edge)
+            self._parent_to_edge[parent].add(edge)
 
     def remove_parent(self, child, parent):
         edge = (child, parent)
-        self._parent_from_edge[child].remove(edge)
-        self._parent_to_edge[parent].remove(edge)
+        with self._lock:
+            self._parent_from_edge[child].remove(edge)
+            self._parent_to_edge[parent].remove(edge)
 
     def remove_node(self, node):
-        edges = set()
-        edges = edges | self._parent_from_edge[node]
-        edges = edges | self._parent_to_edge[node]
-        for e in edges:
-            self.remove_parent(e[0], e[1])
-        del self._parent_to_edge[node]
-        del self._parent_from_edge[node]
+        with self._lock:
+            edges = set()
+            edges = edges | self._parent_from_edge[node]
+            edges = edges | self._parent_to_edge[node]
+            for e in edges:
+                self.remove_parent(e[0], e[1])
+            del self._parent_to_edge[node]
+            del self._parent_from_edge[node]
 
     def populate(self):
         for srr in StorageResourceRecord.objects.filter(~Q(parents = None)).values('id', 'parents'):
@@ -180,6 +256,15 @@ class SubscriberIndex(object):
             log.debug("what_subscribes: %s" % result)
         return result
 
+    def relates(self, resource):
+        """Does this resource provide or subscribe to anything?"""
+        if resource._meta.subscriptions:
+            return True
+        for subscription in self._all_subscriptions:
+            if isinstance(resource, subscription.subscribe_to):
+                return True
+        return False
+
     def add_provider(self, resource_id, key, value):
         self._provide_value_to_id[(key, value)].add(resource_id)
 
@@ -260,15 +345,22 @@ class ResourceManager(object):
 
     This code is written for multi-threaded use within a single process.
     It is not safe to have multiple processes running plugins at this stage.
-    We serialize operations from different plugins using a big lock, and
-    we use the autocommit decorator on persistence functions because
-    otherwise we would have to explicitly commit at the start of
-    each one to see changes from other threads.
+    Operations on the records of one session's scope run concurrently with
+    those of other sessions, holding only that scope's lock.  Anything which
+    may touch records shared between scopes (GlobalId resources, provide/subscribe
+    links, deletions, alert propagation, Volume creation and balancing) is
+    serialized by taking the global lock exclusively (see ScopeLocks).  We use the
+    autocommit decorator on persistence functions because otherwise we would
+    have to explicitly commit at the start of each one to see changes from
+    other threads.
 
     """
+    # Number of records or attributes resolved per query when persisting resources
+    BULK_SIZE = 1000
+
     def __init__(self):
         self._sessions = {}
-        self._instance_lock = threading.Lock()
+        self._locks = ScopeLocks()
 
         # Map of (resource_global_id, alert_class) to AlertState pk
         self._active_alerts = {}
@@ -288,6 +380,25 @@ class ResourceManager(object):
 
         dse.patch_models()
 
+    def _lock(self, scannable_id, cross_scope):
+        if cross_scope:
+            return self._locks.exclusive()
+        else:
+            return self._locks.scope(scannable_id)
+
+    def _record_crosses_scopes(self, scannable_id, record_id):
+        """Could another scope be writing to this record?"""
+        if record_id == scannable_id:
+            return False
+        return isinstance(self._class_index.get(record_id)._meta.identifier, BaseGlobalId)
+
+    def _resources_cross_scopes(self, resources):
+        """Could persisting these resources touch records of another scope?"""
+        for resource in resources:
+            if isinstance(resource._meta.identifier, BaseGlobalId) or self._subscriber_index.relates(resource):
+                return True
+        return False
+
     def session_open(self,
                      plugin_instance,
                      scannable_id,
@@ -303,7 +414,9 @@ class ResourceManager(object):
         scannable_class = self._class_index.get(scannable_id)
         assert issubclass(scannable_class, BaseScannableResource) or issubclass(scannable_class, HostsideResource)
         log.debug(">> session_open %s (%s resources)" % (scannable_id, len(initial_resources)))
-        with self._instance_lock:
+        # Opening a session merges its whole scope with the global resources
+        # and culls what it no longer reports, so it is serialized.
+        with self._locks.exclusive():
             if scannable_id in self._sessions:
                 log.warning("Clearing out old session for scannable ID %s" % scannable_id)
                 del self._sessions[scannable_id]
@@ -325,21 +438,32 @@ class ResourceManager(object):
             self._cull_lost_resources(session, initial_resources)
 
             self._persist_lun_updates(scannable_id)
+
+        with self._locks.scope(scannable_id):
             self._persist_nid_updates(scannable_id, None, None)
 
-            # Plugins are allowed to create VirtualMachine objects, indicating that
-            # we should created a ManagedHost to go with it (e.g. discovering VMs)
-            self._persist_created_hosts(session, scannable_id, initial_resources)
+        # Plugins are allowed to create VirtualMachine objects, indicating that
+        # we should created a ManagedHost to go with it (e.g. discovering VMs)
+        if self._creates_hosts(initial_resources):
+            with self._locks.exclusive():
+                self._persist_created_hosts(session, scannable_id, initial_resources)
 
         log.debug("<< session_open %s" % scannable_id)
 
     def session_close(self, scannable_id):
-        with self._instance_lock:
+        with self._locks.scope(scannable_id):
             try:
                 del self._sessions[scannable_id]
             except KeyError:
                 log.warning("Cannot remove session for %s, it does not exist" % scannable_id)
 
+    def _creates_hosts(self, resources):
+        """Could persisting these resources create hosts?  Hosts are found or created by
+        the address of VirtualMachine resources, which more than one scope may report,
+        so this is serialized."""
+        from chroma_core.lib.storage_plugin.api.resources import VirtualMachine
+        return any(isinstance(resource, VirtualMachine) for resource in resources)
+
     def _persist_created_hosts(self, session, scannable_id, new_resources):
         # Must be run in a transaction to avoid leaving invalid things in the DB on failure.
         assert transaction.is_managed()
@@ -723,17 +847,18 @@ class ResourceManager(object):
         return True
 
     def balance_unweighted_volume_nodes(self, candidate_volumes, volume_to_volume_nodes=None):
-        if volume_to_volume_nodes is None:
-            volume_to_volume_nodes = defaultdict(list)
-            for vn in VolumeNode.objects.filter(volume__in = candidate_volumes):
-                volume_to_volume_nodes[vn.volume_id].append(vn)
+        with self._locks.exclusive():
+            if volume_to_volume_nodes is None:
+                volume_to_volume_nodes = defaultdict(list)
+                for vn in VolumeNode.objects.filter(volume__in = candidate_volumes):
+                    volume_to_volume_nodes[vn.volume_id].append(vn)
 
-        volumes_for_balancing = []
-        for volume in candidate_volumes:
-            if not self._set_affinity_weights(volume, volume_to_volume_nodes[volume.id]):
-                volumes_for_balancing.append(volume)
+            volumes_for_balancing = []
+            for volume in candidate_volumes:
+                if not self._set_affinity_weights(volume, volume_to_volume_nodes[volume.id]):
+                    volumes_for_balancing.append(volume)
 
-        self._balance_volume_nodes(volumes_for_balancing, volume_to_volume_nodes)
+            self._balance_volume_nodes(volumes_for_balancing, volume_to_volume_nodes)
 
     def _try_removing_volume(self, volume):
         nodes = VolumeNode.objects.filter(volume=volume)
@@ -901,17 +1026,19 @@ class ResourceManager(object):
         This implementation is really so sub optimal at the moment it is untrue, because it gets called
         for every field that changes for every record. I may change this comment if I can work out a solution!
         """
-        with self._instance_lock:
+        session = self._sessions[scannable_id]
+        cross_scope = self._record_crosses_scopes(scannable_id, session.local_id_to_global_id[record_id])
+        with self._lock(scannable_id, cross_scope):
             self._resource_persist_update_attributes(scannable_id, record_id, attrs)
             #self._persist_lun_updates(scannable_id)
             self._persist_nid_updates(scannable_id, record_id, attrs)
             #self._persist_created_hosts(scannable_id, scannable_id, resources)
 
     def session_resource_add_parent(self, scannable_id, local_resource_id, local_parent_id):
+        session = self._sessions[scannable_id]
+        record_pk = session.local_id_to_global_id[local_resource_id]
 
-        with self._instance_lock:
-            session = self._sessions[scannable_id]
-            record_pk = session.local_id_to_global_id[local_resource_id]
+        with self._lock(scannable_id, self._record_crosses_scopes(scannable_id, record_pk)):
 
             # HYD-6845 Test failure: RpcError - missing parent resource
             # This is the worst kind of hack, no excuses but short of not delivering the the product this
@@ -931,9 +1058,10 @@ class ResourceManager(object):
             self._resource_modify_parent(record_pk, parent_pk, False)
 
     def session_resource_remove_parent(self, scannable_id, local_resource_id, local_parent_id):
-        with self._instance_lock:
-            session = self._sessions[scannable_id]
-            record_pk = session.local_id_to_global_id[local_resource_id]
+        session = self._sessions[scannable_id]
+        record_pk = session.local_id_to_global_id[local_resource_id]
+
+        with self._lock(scannable_id, self._record_crosses_scopes(scannable_id, record_pk)):
             parent_pk = session.local_id_to_global_id[local_parent_id]
             self._edges.remove_parent(record_pk, parent_pk)
             self._resource_modify_parent(record_pk, parent_pk, True)
@@ -941,13 +1069,11 @@ class ResourceManager(object):
     def session_get_stats(self, scannable_id, local_resource_id, update_data):
         """Get global ID for a resource, look up the StoreageResourceStatistic for
            each stat in the update, and invoke its .metrics.update with the data"""
-       # FIXME: definitely could be doing finer grained locking here as although
-       # we need the coarse one for protecting local_id_to_global_id etc, the later
-       # part of actually updating stats just needs to be locked on a per-statistic basis
-        with self._instance_lock:
-                session = self._sessions[scannable_id]
-                record_pk = session.local_id_to_global_id[local_resource_id]
-                return self._get_stats(record_pk, update_data)
+        session = self._sessions[scannable_id]
+        record_pk = session.local_id_to_global_id[local_resource_id]
+
+        with self._lock(scannable_id, self._record_crosses_scopes(scannable_id, record_pk)):
+            return self._get_stats(record_pk, update_data)
 
     def _get_stats(self, record_pk, update_data):
         # Must be run in a transaction to avoid leaving invalid things in the DB on failure.
@@ -1010,19 +1136,28 @@ class ResourceManager(object):
         # Must be run in a transaction to avoid leaving invalid things in the DB on failure.
         assert transaction.is_managed()
 
-        with self._instance_lock:
-            session = self._sessions[scannable_id]
+        session = self._sessions[scannable_id]
+        with self._lock(scannable_id, self._resources_cross_scopes(resources)):
             self._persist_new_resources(session, resources)
-            self._persist_lun_updates(scannable_id)
+
+        if issubclass(self._class_index.get(scannable_id), HostsideResource):
+            # New device nodes may add VolumeNodes to Volumes shared with other hosts
+            with self._locks.exclusive():
+                self._persist_lun_updates(scannable_id)
+
+        with self._locks.scope(scannable_id):
             self._persist_nid_updates(scannable_id, None, None)
-            self._persist_created_hosts(session, scannable_id, resources)
+
+        if self._creates_hosts(resources):
+            with self._locks.exclusive():
+                self._persist_created_hosts(session, scannable_id, resources)
 
     @advisory_lock(AlertState, wait=False)
     def session_remove_local_resources(self, scannable_id, resources):
         # Must be run in a transaction to avoid leaving invalid things in the DB on failure.
         assert transaction.is_managed()
 
-        with self._instance_lock:
+        with self._locks.exclusive():
             session = self._sessions[scannable_id]
             for local_resource in resources:
                 try:
@@ -1038,7 +1173,7 @@ class ResourceManager(object):
         # Must be run in a transaction to avoid leaving invalid things in the DB on failure.
         assert transaction.is_managed()
 
-        with self._instance_lock:
+        with self._locks.exclusive():
             session = self._sessions[scannable_id]
             resources = session._plugin_instance._index._local_id_to_resource.values()
 
@@ -1049,7 +1184,7 @@ class ResourceManager(object):
         # Must be run in a transaction to avoid leaving invalid things in the DB on failure.
         assert transaction.is_managed()
 
-        with self._instance_lock:
+        with self._locks.exclusive():
             session = self._sessions[scannable_id]
             record_pk = session.local_id_to_global_id[resource_local_id]
             if active:
@@ -1301,7 +1436,7 @@ class ResourceManager(object):
         StorageResourceRecord.delayed.flush()
 
     def global_remove_resource(self, resource_id):
-        with self._instance_lock:
+        with self._locks.exclusive():
             with transaction.commit_manually():
                 # Be extra-sure to see a fresh view (HYD-1301)
                 transaction.commit()
@@ -1357,6 +1492,42 @@ class ResourceManager(object):
 
         return result
 
+    def _get_or_create_records(self, keys):
+        """
+        Resolve (resource_class_id, storage_id_str, storage_id_scope_id) keys to
+        StorageResourceRecords, creating the missing records in bulk.
+
+        :return: dict of key to (record, created)
+        """
+        def lookup(keys):
+            found = {}
+            wanted = set(keys)
+            keys = list(wanted)
+            for offset in range(0, len(keys), self.BULK_SIZE):
+                chunk = keys[offset:offset + self.BULK_SIZE]
+                for values in StorageResourceRecord.objects.filter(
+                        resource_class__in = set(key[0] for key in chunk),
+                        storage_id_str__in = set(key[1] for key in chunk)).values_list(
+                        'resource_class_id', 'storage_id_str', 'storage_id_scope_id', 'id'):
+                    key = values[:3]
+                    if key in wanted and key not in found:
+                        found[key] = StorageResourceRecord(resource_class_id = key[0],
+                                                           storage_id_str = key[1],
+                                                           storage_id_scope_id = key[2],
+                                                           id = values[3])
+            return found
+
+        records = dict((key, (record, False)) for key, record in lookup(keys).items())
+        missing = [key for key in set(keys) if key not in records]
+        if missing:
+            StorageResourceRecord.objects.bulk_create([StorageResourceRecord(resource_class_id = resource_class_id,
+                                                                             storage_id_str = storage_id_str,
+                                                                             storage_id_scope_id = scope_id)
+                                                       for resource_class_id, storage_id_str, scope_id in missing])
+            records.update((key, (record, True)) for key, record in lookup(missing).items())
+
+        return records
+
     def _persist_new_resources(self, session, resources):
         from chroma_core.lib.storage_plugin.manager import storage_plugin_manager
 
@@ -1405,66 +1576,87 @@ class ResourceManager(object):
 
         # Create StorageResourceRecords for any resources which
         # do not already have one, and update the local_id_to_global_id
-        # map with the DB ID for each resource.
+        # map with the DB ID for each resource.  Records are resolved in
+        # rounds: a resource whose ID refers to another resource waits for
+        # the round after the referenced resource's record is resolved.
         creations = {}
-        for resource in ordered_for_creation:
-            if isinstance(resource._meta.identifier, BaseScopedId):
-                scope_id = session.scannable_id
-            elif isinstance(resource._meta.identifier, BaseGlobalId):
-                scope_id = None
-            else:
-                raise NotImplementedError
-
-            resource_class, resource_class_id = storage_plugin_manager.get_plugin_resource_class(
-                resource.__class__.__module__,
-                resource.__class__.__name__)
-
-            id_tuple = resource.id_tuple()
-            cleaned_id_items = []
-            for t in id_tuple:
-                if isinstance(t, BaseStorageResource):
-                    cleaned_id_items.append(session.local_id_to_global_id[t._handle])
+        pending = ordered_for_creation
+        while pending:
+            keys = []
+            deferred = []
+            for resource in pending:
+                if isinstance(resource._meta.identifier, BaseScopedId):
+                    scope_id = session.scannable_id
+                elif isinstance(resource._meta.identifier, BaseGlobalId):
+                    scope_id = None
                 else:
-                    cleaned_id_items.append(t)
+                    raise NotImplementedError
 
-            id_str = json.dumps(tuple(cleaned_id_items))
+                resource_class, resource_class_id = storage_plugin_manager.get_plugin_resource_class(
+                    resource.__class__.__module__,
+                    resource.__class__.__name__)
 
-            record, created = StorageResourceRecord.objects.get_or_create(
-                resource_class_id = resource_class_id,
-                storage_id_str = id_str,
-                storage_id_scope_id = scope_id)
+                id_tuple = resource.id_tuple()
+                if keys and [t for t in id_tuple if isinstance(t, BaseStorageResource) and t._handle not in session.local_id_to_global_id]:
+                    deferred.append(resource)
+                    continue
 
-            session.local_id_to_global_id[resource._handle] = record.pk
-            session.global_id_to_local_id[record.pk] = resource._handle
-            self._label_cache[record.id] = resource.get_label()
-
-            if created:
-                # Record a user-visible event
-                log.debug("ResourceManager._persist_new_resource[%s] %s %s %s" % (session.scannable_id, created, record.pk, resource._handle))
-
-            creations[resource] = (record, created)
-
-            # Add the new record to the index so that future records and resolve their
-            # provide/subscribe relationships with respect to it
-            self._subscriber_index.add_resource(record.pk, resource)
-
-            self._class_index.add_record(record.pk, resource_class)
+                cleaned_id_items = []
+                for t in id_tuple:
+                    if isinstance(t, BaseStorageResource):
+                        cleaned_id_items.append(session.local_id_to_global_id[t._handle])
+                    else:
+                        cleaned_id_items.append(t)
+
+                id_str = json.dumps(tuple(cleaned_id_items))
+                keys.append((resource, resource_class, (resource_class_id, id_str, scope_id)))
+
+            records = self._get_or_create_records([key for resource, resource_class, key in keys])
+            for resource, resource_class, key in keys:
+                record, created = records[key]
+                if created:
+                    # Only the first resource with this key created its record
+                    records[key] = (record, False)
+
+                session.local_id_to_global_id[resource._handle] = record.pk
+                session.global_id_to_local_id[record.pk] = resource._handle
+                self._label_cache[record.id] = resource.get_label()
+
+                if created:
+                    # Record a user-visible event
+                    log.debug("ResourceManager._persist_new_resource[%s] %s %s %s" % (session.scannable_id, created, record.pk, resource._handle))
+
+                creations[resource] = (record, created)
+
+                # Add the new record to the index so that future records and resolve their
+                # provide/subscribe relationships with respect to it
+                self._subscriber_index.add_resource(record.pk, resource)
+
+                self._class_index.add_record(record.pk, resource_class)
+
+            pending = deferred
+
+        # Link GlobalId resources to the scope reporting them, if they are not linked yet
+        reported_ids = set(record.id for resource, (record, created) in creations.items()
+                           if isinstance(resource._meta.identifier, BaseGlobalId) and session.scannable_id != record.id)
+        if reported_ids:
+            ReportedBy = StorageResourceRecord.reported_by.through
+            reported_ids -= set(ReportedBy.objects.filter(
+                from_storageresourcerecord__in = reported_ids,
+                to_storageresourcerecord = session.scannable_id).values_list('from_storageresourcerecord_id', flat = True))
+            for record_id in reported_ids:
+                log.debug("saw GlobalId resource %s from scope %s for the first time" % (record_id, session.scannable_id))
+            ReportedBy.objects.bulk_create([ReportedBy(from_storageresourcerecord_id = record_id,
+                                                       to_storageresourcerecord_id = session.scannable_id)
+                                            for record_id in reported_ids])
 
         # Update or create attribute records
-        attr_classes = set()
+        attr_values = defaultdict(dict)  # Map of attribute model class to map of (record id, key) to encoded value
         for resource in ordered_for_creation:
             record, created = creations[resource]
 
-            if isinstance(resource._meta.identifier, BaseGlobalId) and session.scannable_id != record.id:
-                try:
-                    record.reported_by.get(pk = session.scannable_id)
-                except StorageResourceRecord.DoesNotExist:
-                    log.debug("saw GlobalId resource %s from scope %s for the first time" % (record.id, session.scannable_id))
-                    record.reported_by.add(session.scannable_id)
-
             resource_class = storage_plugin_manager.get_resource_class_by_id(record.resource_class_id)
 
-            attrs = {}
             # Special case for ResourceReference attributes, because the resource
             # object passed from the plugin won't have a global ID for the referenced
             # resource -- we have to do the lookup inside ResourceManager
@@ -1472,42 +1664,35 @@ class ResourceManager(object):
                 attribute_obj = resource_class.get_attribute_properties(key)
                 if isinstance(attribute_obj, attributes.ResourceReference):
                     if value and not value._handle_global:
-                        attrs[key] = session.local_id_to_global_id[value._handle]
+                        value = session.local_id_to_global_id[value._handle]
                     elif value and value._handle_global:
-                        attrs[key] = value._handle
-                    else:
-                        attrs[key] = value
-                else:
-                    attrs[key] = value
-
-            for key, val in attrs.items():
-                resource_class = storage_plugin_manager.get_resource_class_by_id(record.resource_class_id)
+                        value = value._handle
 
-                # Try to update an existing record
                 attr_model_class = resource_class.attr_model_class(key)
+                attr_values[attr_model_class][(record.id, key)] = attr_model_class.encode(value)
+
+        existing_ids = [record.id for record, created in creations.values() if not created]
+        for attr_model_class, values in attr_values.items():
+            value_field = 'value' if issubclass(attr_model_class, StorageResourceAttributeSerialized) else 'value_id'
+
+            # Update the existing attributes whose values changed
+            existing = {}
+            for offset in range(0, len(existing_ids), self.BULK_SIZE):
+                for resource_id, key, value in attr_model_class.objects.filter(
+                        resource__in = existing_ids[offset:offset + self.BULK_SIZE]).values_list('resource_id', 'key', value_field):
+                    existing[(resource_id, key)] = value
+            # New attributes are written from this thread rather than through the
+            # process-wide dse buffer, which sessions in other scopes may be using
+            new_attributes = []
+            for (resource_id, key), value in values.items():
+                if (resource_id, key) in existing:
+                    if existing[(resource_id, key)] != value:
+                        attr_model_class.objects.filter(resource = resource_id, key = key).update(value = value)
+                else:
+                    new_attributes.append(attr_model_class(**{'resource_id': resource_id, 'key': key, value_field: value}))
 
-                updated = attr_model_class.objects.filter(
-                    resource = record,
-                    key = key).update(value = attr_model_class.encode(val))
-
-                # If there was no existing record, create one
-                if not updated:
-                    attr_classes.add(attr_model_class)
-                    if issubclass(attr_model_class, StorageResourceAttributeSerialized):
-                        data = dict(
-                            resource_id = record.id,
-                            key = key,
-                            value = attr_model_class.encode(val))
-
-                    else:
-                        data = dict(
-                            resource_id = record.id,
-                            key = key,
-                            value_id = attr_model_class.encode(val))
-                    attr_model_class.delayed.insert(data)
-
-        for attr_model_class in attr_classes:
-            attr_model_class.delayed.flush()
+            for offset in range(0, len(new_attributes), self.BULK_SIZE):
+                attr_model_class.objects.bulk_create(new_attributes[offset:offset + self.BULK_SIZE])
 
         # Find out if new resources match anything in SubscriberIndex and create
         # relationships if so.
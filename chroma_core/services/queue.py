@@ -36,11 +36,16 @@ class ServiceQueue(object):
     """
     name = None
 
-    def put(self, body):
+    def put(self, body, **kwargs):
         with _amqp_connection() as conn:
             q = conn.SimpleQueue(self.name, serializer = 'json',
                                  exchange_opts={'durable': False}, queue_opts={'durable': False})
-            q.put(body)
+            q.put(body, **kwargs)
+
+    def qsize(self):
+        with _amqp_connection() as conn:
+            return conn.SimpleQueue(self.name,
+                                    exchange_opts={'durable': False}, queue_opts={'durable': False}).qsize()
 
     def purge(self):
         with _amqp_connection() as conn:
@@ -71,6 +76,27 @@ class ServiceQueue(object):
                 except QueueEmpty:
                     pass
 
+    def serve_batch(self, callback, max_size):
+        """Like serve, but call back with a list of all the messages waiting, up to `max_size`,
+        so that the consumer can process a burst of messages in one go."""
+        from Queue import Empty as QueueEmpty
+        with _amqp_connection() as conn:
+            q = conn.SimpleQueue(self.name, serializer = 'json',
+                                 exchange_opts={'durable': False}, queue_opts={'durable': False})
+            while not self._stopping.is_set():
+                try:
+                    messages = [q.get(timeout = 1)]
+                except QueueEmpty:
+                    continue
+                while len(messages) < max_size:
+                    try:
+                        messages.append(q.get_nowait())
+                    except QueueEmpty:
+                        break
+                for message in messages:
+                    message.ack()
+                callback([message.decode() for message in messages])
+
 
 class AgentRxQueue(ServiceQueue):
     def __route_message(self, message):
@@ -3,44 +3,235 @@
 # license that can be found in the LICENSE file.
 
 
+import sys
+import time
+import signal
+import struct
+import functools
+import threading
 import traceback
+import collections
+import multiprocessing
+from array import array
 from django import db
 from django.utils import dateparse
 from chroma_core.models import Stats
-from chroma_core.services import ChromaService, log_register, queue
+from chroma_core.models.stats import epoch, total_seconds
+from chroma_core.services import ChromaService, ServiceThread, log_register, queue
+from chroma_core.services.rpc import ServiceRpcInterface
+
+import settings
 
 
 log = log_register(__name__)
 
 
+FRAME_MAGIC = 'IMLS'
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct('<4sHI')  # magic, version, number of samples
+FRAME_COLUMNS = 'Idd'  # little-endian uint32 series ids, float64 utc timestamps, float64 values
+CACHE_COUNTERS = 'hits', 'misses', 'evictions', 'entries', 'weight'
+
+
+def encode(samples):
+    "Return a binary frame of samples (id, dt, value):  a header followed by a packed array for each field."
+    columns = [array(code) for code in FRAME_COLUMNS]
+    for id, dt, value in samples:
+        columns[0].append(id)
+        columns[1].append(total_seconds(dt - epoch))
+        columns[2].append(value)
+    if sys.byteorder != 'little':
+        for column in columns:
+            column.byteswap()
+    return FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, len(columns[0])) + ''.join(column.tostring() for column in columns)
+
+
+def decode(frame):
+    "Return arrays of ids, timestamps, and values from a binary frame."
+    magic, version, count = FRAME_HEADER.unpack_from(frame)
+    if (magic, version) != (FRAME_MAGIC, FRAME_VERSION):
+        raise ValueError("Unsupported stats frame {0!r} version {1}".format(magic, version))
+    columns, offset = [], FRAME_HEADER.size
+    for code in FRAME_COLUMNS:
+        column = array(code)
+        column.fromstring(buffer(frame, offset, count * column.itemsize))
+        if sys.byteorder != 'little':
+            column.byteswap()
+        columns.append(column)
+        offset += count * column.itemsize
+    return columns
+
+
 class StatsQueue(queue.ServiceQueue):
+    """Samples are sent as JSON, or as binary frames if STATS_QUEUE_BINARY is set.
+    The consumer accepts both, so producers can be upgraded independently.
+
+    If STATS_SHARDS is more than 1, samples are routed by series id to a queue
+    per shard, so that each series is always inserted by the same consumer.
+    """
     name = 'stats'
 
+    def __init__(self, shard=None, stopping=None):
+        super(StatsQueue, self).__init__()
+        self.shard = shard
+        if shard is not None and settings.STATS_SHARDS > 1:
+            self.name = 'stats_{0:d}'.format(shard)
+        if stopping is not None:
+            self._stopping = stopping
+
     def put(self, samples):
-        queue.ServiceQueue.put(self, [(id, str(dt), value) for id, dt, value in samples])
+        if self.shard is None and settings.STATS_SHARDS > 1:
+            shards = collections.defaultdict(list)
+            for sample in samples:
+                shards[sample[0] % settings.STATS_SHARDS].append(sample)
+            for shard in shards:
+                StatsQueue(shard).put(shards[shard])
+        elif settings.STATS_QUEUE_BINARY:
+            queue.ServiceQueue.put(self, encode(samples), content_type='application/data', content_encoding='binary')
+        else:
+            queue.ServiceQueue.put(self, [(id, str(dt), value) for id, dt, value in samples])
+
+
+class StatsRpc(ServiceRpcInterface):
+    methods = ['cache_stats', 'shard_status']
+
+
+def caches():
+    "Return (name, cache) of the sample caches;  series are resolved, and their caches counted, by the services sending samples."
+    return [(model.__name__, model.cache) for model in Stats]
+
+
+class StatsExpirer(object):
+    """
+    This thread periodically expires stored samples, so that
+    range deletes are batched rather than run on every insert.
+    Only one runs per service;  if the inserting shards are other processes
+    it doesn't know which series they inserted, so it expires by age alone.
+    """
+
+    def __init__(self, stopping=None, simple=False):
+        self._stopping = stopping or threading.Event()
+        self.simple = simple
+
+    def run(self):
+        while not self._stopping.is_set():
+            self._stopping.wait(settings.STATS_EXPIRE_INTERVAL)
+            try:
+                with db.transaction.commit_on_success():
+                    Stats.expire(simple=self.simple)
+            except:
+                log.error("Error expiring stats: " + traceback.format_exc())
+
+    def stop(self):
+        self._stopping.set()
 
 
 class Service(ChromaService):
+    """Insert samples from the stats queue.  With multiple shards, each shard is
+    consumed by a worker process with its own rollup state and database connection.
+    """
+
+    def __init__(self):
+        super(Service, self).__init__()
+        self._stopping = multiprocessing.Event()
+        self.lags = multiprocessing.Array('d', settings.STATS_SHARDS)
+        self.cache_counters = multiprocessing.Array('d', settings.STATS_SHARDS * len(caches()) * len(CACHE_COUNTERS))
+
+    def cache_stats(self):
+        "Return counters of the sample caches, summed over shards, for sizing them."
+        counters = self.cache_counters[:]
+        size = len(caches()) * len(CACHE_COUNTERS)
+        totals = [sum(counters[offset::size]) for offset in range(size)]
+        return dict((name, dict(zip(CACHE_COUNTERS, map(int, totals[index * len(CACHE_COUNTERS):(index + 1) * len(CACHE_COUNTERS)]))))
+                    for index, (name, cache) in enumerate(caches()))
+
+    def publish(self, shard):
+        "Copy counters of this shard's caches to shared memory for cache_stats."
+        counters = [cache.stats()[counter] for name, cache in caches() for counter in CACHE_COUNTERS]
+        self.cache_counters[shard * len(counters):(shard + 1) * len(counters)] = counters
+
+    def shard_status(self):
+        "Return seconds behind the newest inserted sample, and number of queued messages, of each shard."
+        return [{'shard': shard, 'lag': self.lags[shard], 'queued': StatsQueue(shard).qsize()} for shard in range(settings.STATS_SHARDS)]
+
     def run(self):
         super(Service, self).run()
 
-        self.queue = StatsQueue()
-        self.queue.purge()
-        self.queue.serve(callback=self.insert)
+        workers = []
+        if settings.STATS_SHARDS > 1:
+            # workers must open their own database connections
+            db.connection.close()
+            for shard in range(settings.STATS_SHARDS):
+                workers.append(multiprocessing.Process(target=self.serve, args=(shard,), name='stats_{0:d}'.format(shard)))
+                workers[-1].start()
+
+        # This thread services cache statistics and shard status RPCs
+        rpc_thread = ServiceThread(StatsRpc(self))
+        rpc_thread.start()
 
-    def insert(self, samples):
+        expirer_thread = ServiceThread(StatsExpirer(self._stopping, simple=bool(workers)))
+        expirer_thread.start()
+
+        if workers:
+            while not self._stopping.is_set():
+                self._stopping.wait(10)
+            for worker in workers:
+                worker.join()
+        else:
+            self.serve(0)
+
+        expirer_thread.join()
+        rpc_thread.stop()
+        rpc_thread.join()
+
+    def serve(self, shard):
+        "Consume and insert samples of one shard until stopped."
+        if multiprocessing.current_process().name != 'MainProcess':
+            # the parent process stops workers on signals
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            # expired by age in the parent, so inserted series need not be recorded
+            Stats.expiring = None
+
+        stats_queue = StatsQueue(shard, self._stopping)
+        stats_queue.purge()
+        stats_queue.serve(callback=functools.partial(self.insert, shard=shard))
+
+    def insert(self, samples, shard=0):
+        ids = ()
         try:
-            outdated = Stats.insert((id, dateparse.parse_datetime(dt), value) for id, dt, value in samples)
-        except db.IntegrityError:
-            log.error("Duplicate stats insert: " + db.connection.queries[-1]['sql'])
-            db.transaction.rollback()  # allow future stats to still work
+            if isinstance(samples, str):
+                ids, timestamps, values = decode(samples)
+                outdated = Stats.insert_columns(ids, timestamps, values)
+            else:
+                samples = [(id, dateparse.parse_datetime(dt), value) for id, dt, value in samples]
+                ids = [id for id, dt, value in samples]
+                timestamps = [total_seconds(dt - epoch) for id, dt, value in samples]
+                outdated = Stats.insert(samples)
+        except db.IntegrityError as error:
+            log.error("Duplicate stats insert: {0}".format(error))
+            self.abort(ids)
         except:
             log.error("Error handling stats insert: " + traceback.format_exc())
+            self.abort(ids)
         else:
+            if len(timestamps):
+                self.lags[shard] = time.time() - max(timestamps)
             if outdated:
                 log.warn("Outdated samples ignored: {0}".format(outdated))
+        self.publish(shard)
+
+    def abort(self, ids):
+        "Roll back a failed insert so that future stats still work, and forget rolled up state advanced past the lost rows."
+        try:
+            db.transaction.rollback()
+        except Exception:
+            # the connection is unusable;  the next insert opens a new one
+            log.error("Error rolling back stats insert: " + traceback.format_exc())
+            db.connection.close()
+        Stats.reset(ids)
 
     def stop(self):
         super(Service, self).stop()
 
-        self.queue.stop()
+        self._stopping.set()
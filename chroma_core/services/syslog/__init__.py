@@ -4,13 +4,18 @@
 
 
 import os
+import gzip
+import Queue
+import threading
 import dse
 
+from django import db
 from django.db import transaction
 
 from chroma_core.services.syslog.parser import LogMessageParser
+from chroma_core.lib.log_substitution import substitution_index
 from chroma_core.models.log import LogMessage
-from chroma_core.services import ChromaService, log_register
+from chroma_core.services import ChromaService, ServiceThread, log_register
 from chroma_core.services.queue import AgentRxQueue
 from iml_common.lib.date_time import IMLDateTime
 
@@ -20,53 +25,142 @@ import settings
 log = log_register('systemd_journal')
 
 
-class Service(ChromaService):
-    PLUGIN_NAME = 'systemd_journal'
+class EventWriter(object):
+    """
+    Second stage of ingest: creates the events for the log lines which the
+    parser matched, a batch of lines per transaction.
+    """
+    MAX_BATCH = 1000
 
-    def __init__(self):
-        super(Service, self).__init__()
-        self._queue = AgentRxQueue(Service.PLUGIN_NAME)
-        self._queue.purge()
-        self._table_size = LogMessage.objects.count()
-        self._parser = LogMessageParser()
+    def __init__(self, parser):
+        self._parser = parser
+        self._hits = Queue.Queue()
+        self._stopping = threading.Event()
 
-        dse.patch_models()
+    def put(self, fqdn, message, handler):
+        self._hits.put((fqdn, message, handler))
 
-    def _check_size(self):
-        """Apply a size limit to the table of log messages"""
-        MAX_ROWS_PER_TRANSACTION = 10000
-        removed_num_entries = 0
-        overflow_filename = os.path.join(settings.LOG_PATH, "db_log")
+    def _drain(self, hits):
+        while len(hits) < self.MAX_BATCH:
+            try:
+                hits.append(self._hits.get_nowait())
+            except Queue.Empty:
+                break
+        return hits
+
+    def run(self):
+        while not self._stopping.is_set():
+            try:
+                hits = self._drain([self._hits.get(timeout = 1)])
+            except Queue.Empty:
+                continue
+            self._parser.parse_many(hits)
 
-        if self._table_size > settings.DBLOG_HW:
+        # Write whatever was matched before the service stopped
+        hits = self._drain([])
+        while hits:
+            self._parser.parse_many(hits)
+            hits = self._drain([])
+
+        db.connection.close()
+
+    def stop(self):
+        self._stopping.set()
+
+
+class LogArchiver(object):
+    """
+    Applies a size limit to the table of log messages: when it grows beyond
+    DBLOG_HW rows, the oldest rows are streamed to a compressed file with a
+    server side cursor and then deleted by id range, down to DBLOG_LW rows.
+    """
+    FETCH_SIZE = 10000
+    MAX_ROWS_PER_TRANSACTION = 10000
+
+    def __init__(self, table_size):
+        self._table_size = table_size
+        self._lock = threading.Lock()
+        self._overflow = threading.Event()
+        self._stopping = threading.Event()
+        self.filename = os.path.join(settings.LOG_PATH, "db_log.gz")
+
+    def inserted(self, count):
+        with self._lock:
+            self._table_size += count
+            if self._table_size > settings.DBLOG_HW:
+                self._overflow.set()
+
+    def run(self):
+        while not self._stopping.is_set():
+            self._overflow.wait(1)
+            if self._overflow.is_set() and not self._stopping.is_set():
+                self._overflow.clear()
+                try:
+                    self.archive()
+                except Exception, e:
+                    log.error("Error archiving DB log entries to %s: %s" % (self.filename, e))
+
+        db.connection.close()
+
+    def stop(self):
+        self._stopping.set()
+
+    def archive(self):
+        with self._lock:
             remove_num_entries = self._table_size - settings.DBLOG_LW
+        if remove_num_entries <= 0:
+            return 0
 
-            trans_size = min(MAX_ROWS_PER_TRANSACTION, remove_num_entries)
-            with transaction.commit_on_success():
-                while remove_num_entries > 0:
-                    removed_entries = LogMessage.objects.all().order_by('id')[0:trans_size]
-                    self.log.debug("writing %s batch of entries" % trans_size)
-                    try:
-                        f = open(overflow_filename, "a")
-                        for line in removed_entries:
-                            f.write("%s\n" % line.__str__())
-                        LogMessage.objects.filter(id__lte = removed_entries[-1].id).delete()
-                    except Exception, e:
-                        self.log.error("error opening/writing/closing the db_log: %s" % e)
-                    finally:
-                        f.close()
+        table = LogMessage._meta.db_table
+        cursor = db.connection.cursor()
+        with transaction.commit_on_success():
+            cursor.execute("SELECT MIN(id), MAX(id) FROM (SELECT id FROM %s ORDER BY id LIMIT %%s) AS oldest" % table,
+                           [remove_num_entries])
+            first_id, last_id = cursor.fetchone()
+            if first_id is None:
+                return 0
+
+            rows = db.connection.connection.cursor(name = 'log_archive')
+            rows.itersize = self.FETCH_SIZE
+            rows.execute("SELECT datetime, fqdn, severity, facility, tag, message FROM %s WHERE id <= %%s ORDER BY id" % table,
+                         [last_id])
+            f = gzip.open(self.filename, "ab")
+            try:
+                for row in rows:
+                    f.write((u"%s %s %s %s %s %s\n" % row).encode('utf-8'))
+            finally:
+                f.close()
+                rows.close()
 
-                    remove_num_entries -= trans_size
-                    removed_num_entries += trans_size
-                    if remove_num_entries < trans_size:
-                        trans_size = remove_num_entries
+        removed_num_entries = 0
+        for after_id in xrange(first_id - 1, last_id, self.MAX_ROWS_PER_TRANSACTION):
+            with transaction.commit_on_success():
+                cursor.execute("DELETE FROM %s WHERE id > %%s AND id <= %%s" % table,
+                               [after_id, min(after_id + self.MAX_ROWS_PER_TRANSACTION, last_id)])
+                removed_num_entries += cursor.rowcount
 
-        self._table_size -= removed_num_entries
-        self.log.info("Wrote %s DB log entries to %s" % (removed_num_entries, overflow_filename))
+        with self._lock:
+            self._table_size -= removed_num_entries
+        log.info("Wrote %s DB log entries to %s" % (removed_num_entries, self.filename))
 
         return removed_num_entries
 
+
+class Service(ChromaService):
+    PLUGIN_NAME = 'systemd_journal'
+
+    def __init__(self):
+        super(Service, self).__init__()
+        self._queue = AgentRxQueue(Service.PLUGIN_NAME)
+        self._queue.purge()
+        self._parser = LogMessageParser()
+        self._event_writer = EventWriter(self._parser)
+        self._archiver = LogArchiver(LogMessage.objects.count())
+
+        dse.patch_models()
+
     def on_data(self, fqdn, body):
+        inserted = 0
         with transaction.commit_on_success():
             with LogMessage.delayed as log_messages:
                 for msg in body['log_lines']:
@@ -78,19 +172,33 @@ class Service(ChromaService):
                             facility = msg['facility'],
                             tag = msg['source'],
                             datetime = IMLDateTime.parse(msg['datetime']).as_datetime,
-                            message_class = LogMessage.get_message_class(msg['message'])
+                            message_class = LogMessage.get_message_class(msg['message']),
+                            substitutions = substitution_index.encode(msg['message']) if settings.LOG_SUBSTITUTIONS_AT_INGEST else None
                         ))
-                        self._table_size += 1
+                        inserted += 1
 
-                        self._parser.parse(fqdn, msg)
+                        handler = self._parser.match(msg)
+                        if handler:
+                            self._event_writer.put(fqdn, msg, handler)
                     except Exception, e:
                         self.log.error("Error %s ingesting systemd-journal entry: %s" % (e, msg))
 
+        self._archiver.inserted(inserted)
+
     def run(self):
         super(Service, self).run()
 
+        threads = [ServiceThread(self._event_writer), ServiceThread(self._archiver)]
+        for thread in threads:
+            thread.start()
+
         self._queue.serve(data_callback = self.on_data)
 
+        for thread in threads:
+            thread.stop()
+        for thread in threads:
+            thread.join()
+
     def stop(self):
         super(Service, self).stop()
 
@@ -6,6 +6,7 @@
 from chroma_core.services import log_register
 from chroma_core.models import SyslogEvent, ClientConnectEvent, ManagedHost
 from django.db import transaction
+from collections import OrderedDict
 import logging
 import re
 
@@ -42,6 +43,78 @@ def _plain_find_one_in_many(haystack, needles):
 find_one_in_many = _plain_find_one_in_many
 
 
+class SelectorMatcher(object):
+    """
+    Single pass matcher for a dict of selector substring -> handler.
+
+    The selectors are grouped by their leading word (up to and including the
+    first space) and each group is compiled into one expression of named
+    alternatives.  Every expression then starts with a literal, which the re
+    engine scans for as fast as str.find, so a line costs one scan per group
+    instead of one per selector, and the matched group names the handler.
+    """
+    def __init__(self, selectors):
+        self._handlers = {}
+        groups = OrderedDict()
+        for index, needle in enumerate(sorted(selectors)):
+            name = "s%d" % index
+            self._handlers[name] = selectors[needle]
+            prefix = needle[:needle.find(" ") + 1]
+            groups.setdefault(prefix, []).append(
+                "(?P<%s>%s)" % (name, re.escape(needle[len(prefix):])))
+
+        self._exprs = [re.compile("%s(?:%s)" % (re.escape(prefix), "|".join(alternatives)))
+                       for prefix, alternatives in groups.items()]
+
+    def match(self, haystack):
+        """Return the handler for the first selector group found in haystack, or None"""
+        for expr in self._exprs:
+            result = expr.search(haystack)
+            if result:
+                return self._handlers[result.lastgroup]
+        return None
+
+
+class RecentClientEvents(object):
+    """
+    Bounded map of lustre pid to the id of the latest ClientConnectEvent
+    raised for it, so that security flavor lines can be correlated with
+    their connection without searching the event table.
+    """
+    MAX_SIZE = 10000
+
+    def __init__(self):
+        self._events = OrderedDict()
+
+    def load(self):
+        """Seed the map with the most recent events in the database"""
+        self._events.clear()
+        latest = ClientConnectEvent.objects.exclude(lustre_pid = None).order_by('-id')
+        for lustre_pid, event_id in reversed(latest.values_list('lustre_pid', 'id')[:self.MAX_SIZE]):
+            self._events.pop(lustre_pid, None)
+            self._events[lustre_pid] = event_id
+
+    def add(self, lustre_pid, event):
+        try:
+            lustre_pid = int(lustre_pid)
+        except (TypeError, ValueError):
+            return
+
+        self._events.pop(lustre_pid, None)
+        self._events[lustre_pid] = event.id
+        while len(self._events) > self.MAX_SIZE:
+            self._events.popitem(last = False)
+
+    def get(self, lustre_pid):
+        try:
+            return self._events.get(int(lustre_pid))
+        except (TypeError, ValueError):
+            return None
+
+
+recent_client_events = RecentClientEvents()
+
+
 def _get_word_after(string, after):
     s = string.find(after) + len(after)
     l = string[s:].find(" ")
@@ -81,7 +154,8 @@ def client_connection_handler(message, host):
          message[target_start:target_end])
     lustre_pid = message[9:9 + message[9:].find(":")]
 
-    ClientConnectEvent.register_event(severity=sev, alert_item=host, message_str=msg, lustre_pid=lustre_pid)
+    event = ClientConnectEvent.register_event(severity=sev, alert_item=host, message_str=msg, lustre_pid=lustre_pid)
+    recent_client_events.add(lustre_pid, event)
 
 
 #
@@ -95,13 +169,18 @@ def server_security_flavor_handler(message, host):
     lustre_pid = message[9:9 + message[9:].find(":")]
 
     # Associate this with a previous client connect event if possible
+    event_id = recent_client_events.get(lustre_pid)
+    if event_id is None:
+        return
+
     try:
-        event = ClientConnectEvent.objects.filter(lustre_pid=lustre_pid).order_by('-id')[0]
-        event.message_str = "%s with security flavor %s" % \
-                            (event.message_str, flavour)
-        event.save()
-    except IndexError:
-        pass
+        event = ClientConnectEvent.objects.get(id = event_id)
+    except ClientConnectEvent.DoesNotExist:
+        return
+
+    event.message_str = "%s with security flavor %s" % \
+                        (event.message_str, flavour)
+    event.save()
 
 
 #
@@ -113,7 +192,8 @@ def admin_client_eviction_handler(message, host):
     uuid = _get_word_after(message, "evicting ")
     msg = "client %s evicted by the administrator" % uuid
     lustre_pid = message[9:9 + message[9:].find(":")]
-    ClientConnectEvent.register_event(severity=logging.WARNING, alert_item=host, message_str=msg, lustre_pid=lustre_pid)
+    event = ClientConnectEvent.register_event(severity=logging.WARNING, alert_item=host, message_str=msg, lustre_pid=lustre_pid)
+    recent_client_events.add(lustre_pid, event)
 
 
 #
@@ -127,7 +207,8 @@ def client_eviction_handler(message, host):
     client = _get_word_after(message, ": evicting client at ")
     msg = "client %s evicted: %s" % (client, reason)
     lustre_pid = _get_word_after(message, "pid: ")
-    ClientConnectEvent.register_event(severity=logging.WARNING, alert_item=host, message_str=msg, lustre_pid=lustre_pid)
+    event = ClientConnectEvent.register_event(severity=logging.WARNING, alert_item=host, message_str=msg, lustre_pid=lustre_pid)
+    recent_client_events.add(lustre_pid, event)
 
 
 class LogMessageParser(object):
@@ -141,6 +222,8 @@ class LogMessageParser(object):
 
     def __init__(self):
         self._hosts = {}
+        self._matcher = SelectorMatcher(self.selectors)
+        recent_client_events.load()
 
     # FIXME: need to update this cache of hosts when a host is removed
     def get_host(self, fqdn):
@@ -154,14 +237,37 @@ class LogMessageParser(object):
             except ManagedHost.DoesNotExist:
                 return None
 
+    def match(self, message):
+        """Return the handler for a log line, or None if it is of no interest"""
+        return self._matcher.match(message['message'])
+
+    def parse_many(self, hits):
+        """
+        Run the handlers for a batch of (fqdn, message, handler) hits in one transaction,
+        with a savepoint per hit so that one bad line does not lose the rest of the batch.
+        """
+        with transaction.commit_on_success():
+            for fqdn, message, fn in hits:
+                h = self.get_host(fqdn)
+                if h is None:
+                    continue
+
+                sid = transaction.savepoint()
+                try:
+                    fn(message['message'], h)
+                except Exception, e:
+                    transaction.savepoint_rollback(sid)
+                    syslog_events_log.error("Failed to parse log line '%s' using handler %s: %s" % (message['message'], fn, e))
+                else:
+                    transaction.savepoint_commit(sid)
+
     def parse(self, fqdn, message):
-        hit = find_one_in_many(message['message'], self.selectors.keys())
-        if hit:
+        fn = self.match(message)
+        if fn:
             h = self.get_host(fqdn)
             if h is None:
                 return
 
-            fn = self.selectors[hit]
             with transaction.commit_manually():
                 try:
                     fn(message['message'], h)
@@ -258,6 +258,21 @@ STATS_5_MINUTE_EXPIRATION = {'days': 7}     # Expiration must be multiple of 5 m
 STATS_1_HOUR_EXPIRATION = {'days': 30}      # Expiration must be multiple of 1 hour.
 STATS_1_DAY_EXPIRATION = {'weeks': 10000}   # Expiration must be multiple of 1 day
 STATS_FLUSH_RATE = 20                       # Flush 20 times per expiration interval - for 10 seconds sample flush every 1day/20.
+STATS_PARTITIONED = False                   # True stores samples in time-range child tables, and expires by dropping them.
+STATS_10_SECOND_PARTITION = {'days': 1}     # Time range of each child table when partitioned.
+STATS_1_MINUTE_PARTITION = {'days': 7}
+STATS_5_MINUTE_PARTITION = {'days': 7}
+STATS_1_HOUR_PARTITION = {'days': 30}
+STATS_1_DAY_PARTITION = {'days': 365}
+STATS_SERIES_CACHE_SIZE = 100000            # Number of series kept in the least recently used cache.
+STATS_SAMPLE_CACHE_SIZE = 64 * 1024 ** 2    # Approximate bytes of recent points cached for each sample resolution.
+STATS_ROLLUP_SIZE = 100000                  # Number of series whose partial aggregates are kept;  others are restored from storage.
+STATS_QUEUE_BINARY = False                  # True sends samples to the stats service as packed binary frames instead of JSON.
+STATS_SHARDS = 1                            # Number of stats worker processes, each inserting the series whose id modulo this is its shard.
+                                            # With more than 1, points are expired by age, as with STATS_SIMPLE_WIPE.
+STATS_EXPIRE_INTERVAL = 60                  # Seconds between expiry passes of the stats service, off the insert path.
+
+LUSTRE_AUDIT_WORKERS = 4                    # Number of hosts whose lustre audit reports are processed at once.
 
 # When agent sends VPD 0x80 and 0x83 serial numbers, which do we prefer to use
 # for the canonical device serial on the manager?  Favorite first.
@@ -291,17 +306,26 @@ ALLOW_ANONYMOUS_READ = True
 # Long poll timeout Seconds
 LONG_POLL_TIMEOUT_SECONDS = (60 * 5)
 
+# Set to True to learn of changes to long polled tables from triggers which NOTIFY
+# the job_scheduler, instead of from RPCs sent by each process on every write.
+# The triggers are created by migration 0044, which lists the long polled tables.
+LONG_POLLING_NOTIFY = False
+
 # Allow Cookie to be read from JavaScript and passed to
 # Realtime service
 SESSION_COOKIE_HTTPONLY = False
 
 # The value at which log entries in the database will be aged out to a
-# flat text file in /var/log/chroma/db_log
+# compressed text file in /var/log/chroma/db_log.gz
 DBLOG_HW = 1200000
 # The value at which we stop aging database log entries out to a flat
 # text file
 DBLOG_LW = 1000000
 
+# Set to True to resolve the hosts and targets referred to by log messages as they
+# are received, rather than each time they are listed by the API
+LOG_SUBSTITUTIONS_AT_INGEST = False
+
 # In development, where to serve repos from
 DEV_REPO_PATH = os.path.join(os.path.dirname(os.path.abspath(sys.modules['settings'].__file__)), 'repo')
 
@@ -47,3 +47,23 @@ class TestLogResource(ChromaApiTestCase):
             log_entries = [log_entry['message'] for log_entry in self.deserialize(client.get('/api/log/'))['objects']]
             xs = self.messages[::-1]
             self.assertListEqual(xs, log_entries)
+
+    def test_search(self):
+        """Verifies the search argument matches words of the message"""
+
+        response = self.api_client.get('/api/log/', data = {'search': 'normal'})
+        log_entries = [log_entry['message'] for log_entry in self.deserialize(response)['objects']]
+        self.assertListEqual(['Lustre: Normal Lustre Message'], log_entries)
+
+    def test_get_logs_before(self):
+        """Verifies paging by the before argument visits every log entry once, newest first"""
+
+        response = self.api_client.get('/api/log/', data = {'before': '', 'limit': 2})
+        page = self.deserialize(response)
+        self.assertEqual(len(page['objects']), 2)
+        log_entries = [log_entry['message'] for log_entry in page['objects']]
+
+        next_page = self.deserialize(self.api_client.get(page['meta']['next']))
+        log_entries += [log_entry['message'] for log_entry in next_page['objects']]
+        self.assertIsNone(next_page['meta']['next'])
+        self.assertListEqual(self.messages[::-1], log_entries)
@@ -0,0 +1,47 @@
+import threading
+
+import mock
+from django.http import HttpResponse
+
+from chroma_api.long_polling_api import LongPollingBroker
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class TestLongPollingBroker(IMLUnitTestCase):
+    "Test the sharing of waits and responses between long polling requests."
+
+    def test_wait(self):
+        def wait_table_change(version, tables, timeout):
+            return {'chroma_core_managedhost': 200, 'max_timestamp': 200} if version['max_timestamp'] < 200 else 0
+
+        broker = LongPollingBroker()
+        with mock.patch('chroma_api.long_polling_api.JobSchedulerClient.wait_table_change',
+                        mock.Mock(side_effect = wait_table_change)):
+            self.assertEqual(broker.wait(['chroma_core_managedhost'], {'max_timestamp': 100}, 10)['max_timestamp'], 200)
+            self.assertEqual(broker.wait(['chroma_core_managedhost'], {'max_timestamp': 200}, 0.1), 0)
+
+    def test_shared_response(self):
+        dispatched = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def dispatch():
+            calls.append(None)
+            dispatched.set()
+            release.wait(10)
+            return HttpResponse('{}', content_type = 'application/json')
+
+        broker = LongPollingBroker()
+        responses = []
+        threads = [threading.Thread(target = lambda: responses.append(broker.response('key', dispatch))) for i in range(3)]
+        threads[0].start()
+        dispatched.wait(10)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([response.content for response in responses], ['{}'] * 3)
+        self.assertEqual(len(set(id(response) for response in responses)), 3)
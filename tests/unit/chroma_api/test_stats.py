@@ -2,11 +2,16 @@ import os
 import json
 import collections
 import operator
+import itertools
+import bisect
+from datetime import datetime, timedelta
+from unittest import TestCase
 
 from chroma_core.lib.cache import ObjectCache
 from chroma_core.lib import metrics
 from chroma_core.models import ManagedTarget, ManagedTargetMount, ManagedMgs, ManagedMdt, ManagedOst, ManagedFilesystem
 from chroma_core.models import Stats
+from chroma_api.utils import MetricResource
 from .chroma_api_test_case import ChromaApiTestCase
 from tests.unit.chroma_core.helpers import synthetic_host, synthetic_volume_full
 
@@ -137,3 +142,76 @@ class TestStats(ChromaApiTestCase):
         for data, in content.values():
             prefixes = set(name.split('_')[0] for name in data['data'])
             self.assertEqual(prefixes, set(['mem', 'cpu']))
+
+
+def reduce_rows(names, results, reduce_fn):
+    "The original reduction, which looks up each object's value for every timestamp."
+    datetimes = dict((obj_id, sorted(data)) for obj_id, data in results.items())
+    result = {}
+    for dt in set(itertools.chain(*datetimes.values())):
+        result[dt] = counter = metrics.Counter.fromkeys(names, 0.0)
+        for obj_id, stats in results.items():
+            data = stats.get(dt, {})
+            dts = datetimes[obj_id]
+            if dts and not data:  # Didn't have one for this exact timestamp, do we have one before?
+                data = stats[dts[max(bisect.bisect(dts, dt) - 1, 0)]]
+            counter.update(data)
+        if reduce_fn == 'average':
+            for name in counter:
+                counter[name] /= len(results)
+    return result
+
+
+class TestReduce(TestCase):
+    "Test the column-wise reduction of metric lists against the row-wise one."
+
+    def setUp(self):
+        start = datetime(2013, 4, 19, 20, 34)
+        self.dts = [start + timedelta(seconds=10 * n) for n in range(5)]
+        self.resource = MetricResource()
+
+    def assertReduced(self, metrics, results):
+        for reduce_fn in ('sum', 'average'):
+            self.assertEqual(self.resource._reduce(metrics, results, reduce_fn), reduce_rows(metrics, results, reduce_fn))
+
+    def test_aligned(self):
+        "Series with points at every timestamp."
+        results = dict((obj_id, dict((dt, {'cpu_user': 1.5 * obj_id + n, 'mem_MemFree': 100.0 * n}) for n, dt in enumerate(self.dts))) for obj_id in range(3))
+        self.assertReduced(['cpu_user', 'mem_MemFree'], results)
+
+    def test_missing(self):
+        "Series with missing points, missing names, and no points at all."
+        dts = self.dts
+        results = {
+            1: {dts[0]: {'cpu_user': 1.0, 'mem_MemFree': 10.0}, dts[3]: {'cpu_user': 4.0, 'mem_MemFree': 40.0}},
+            2: {dts[1]: {'cpu_user': 2.0}, dts[2]: {'mem_MemFree': 30.0}, dts[4]: {'cpu_user': 5.0, 'mem_MemFree': 50.0}},
+            3: {dts[4]: {'cpu_user': 0, 'mem_MemFree': 0}},
+            4: {},
+        }
+        self.assertReduced(['cpu_user', 'mem_MemFree'], results)
+        self.assertReduced(['cpu_user', 'mem_MemFree', 'missing'], results)
+        self.assertReduced([], results)
+        self.assertReduced(['cpu_user'], {1: {}, 2: {}})
+        self.assertReduced(['cpu_user'], {})
+
+    def test_latest(self):
+        "Staggered single points, including an object without series."
+        epoch = datetime(1970, 1, 1)
+        results = {1: {self.dts[1]: {'kbytesfree': 1.0}}, 2: {self.dts[2]: {'kbytesfree': 2.0, 'kbytestotal': 4.0}}, 3: {epoch: {}}}
+        self.assertReduced(['kbytesfree', 'kbytestotal'], results)
+
+    def test_jobs(self):
+        "Names outside of the requested metrics are only reported where some series has them."
+        dts = self.dts
+        results = {
+            1: {dts[0]: {'cp.0': 1.0}, dts[2]: {'cp.0': 3.0, 'dd.0': 2.0}},
+            2: {dts[1]: {'dd.0': 5.0}, dts[3]: {'ls.0': 7.0}},
+        }
+        self.assertReduced(['read_bytes'], results)
+
+    def test_none(self):
+        "None values mixed with numbers are rejected alike."
+        results = {1: {self.dts[0]: {'cpu_user': 1.0}}, 2: {self.dts[0]: {'cpu_user': None}, self.dts[1]: {'cpu_user': 2.0}}}
+        for reduce_fn in ('sum', 'average'):
+            self.assertRaises(TypeError, self.resource._reduce, ['cpu_user'], results, reduce_fn)
+            self.assertRaises(TypeError, reduce_rows, ['cpu_user'], results, reduce_fn)
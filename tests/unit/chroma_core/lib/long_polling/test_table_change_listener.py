@@ -0,0 +1,59 @@
+import mock
+from psycopg2 import OperationalError
+
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+from chroma_core.lib.long_polling import long_polling
+from chroma_core.lib.long_polling.long_polling import TableChangeListener
+
+
+class TestTableChangeListener(IMLUnitTestCase):
+    def setUp(self):
+        super(TestTableChangeListener, self).setUp()
+
+        self.listener = TableChangeListener()
+        self.listener.RECONNECT_INTERVAL = 0
+        self.connection = mock.Mock()
+
+        self.mock_tables_changed = mock.Mock()
+        mock.patch('chroma_core.lib.long_polling.long_polling.tables_changed', self.mock_tables_changed).start()
+        # the test database connection must stay open
+        mock.patch('chroma_core.lib.long_polling.long_polling.db').start()
+        mock.patch.dict(long_polling.events, {'chroma_core_command': []}, clear=True).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_reconnect(self):
+        """A lost connection is reopened and LISTENed again, waking every waiter"""
+        received = []
+
+        def receive(connection):
+            received.append(connection)
+            if len(received) == 1:
+                raise OperationalError("server closed the connection unexpectedly")
+            self.listener.stop()
+
+        with mock.patch.object(self.listener, '_listen', return_value=self.connection) as listen, \
+                mock.patch.object(self.listener, '_receive', side_effect=receive):
+            self.listener.run()
+
+        self.assertEqual(listen.call_count, 2)
+        self.assertEqual(received, [self.connection] * 2)
+        self.assertEqual(self.mock_tables_changed.call_count, 1)
+        self.assertEqual(self.mock_tables_changed.call_args[0][1], ['chroma_core_command'])
+
+    def test_listen_failure(self):
+        """Failing to connect is retried rather than ending the thread"""
+        listens = [OperationalError("could not connect to server"), self.connection]
+
+        def listen():
+            result = listens.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        with mock.patch.object(self.listener, '_listen', side_effect=listen), \
+                mock.patch.object(self.listener, '_receive', side_effect=lambda connection: self.listener.stop()):
+            self.listener.run()
+
+        self.assertEqual(listens, [])
+        self.assertEqual(self.mock_tables_changed.call_count, 1)
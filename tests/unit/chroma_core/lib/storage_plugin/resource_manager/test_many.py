@@ -1,7 +1,7 @@
 from django.db import connection
 from chroma_core.lib.util import dbperf
 from chroma_core.models.host import Volume, VolumeNode
-from chroma_core.models.storage_plugin import StorageResourceRecord
+from chroma_core.models.storage_plugin import StorageResourceRecord, StorageResourceAttributeSerialized
 from tests.unit.chroma_core.lib.storage_plugin.resource_manager.test_resource_manager import ResourceManagerTestCase
 
 
@@ -49,6 +49,20 @@ class TestManyObjects(ResourceManagerTestCase):
             node_resource = self._make_local_resource('linux', 'LinuxDeviceNode', path = "/dev/foo%s" % n, parents = [dev_resource], host_id = self.host.id)
             self.host_resources.extend([dev_resource, node_resource])
 
+    def test_reopen_session(self):
+        """Reopening a session reuses the existing records and updates changed attributes"""
+        self.resource_manager.session_open(self.plugin, self.couplet_resource_pk, self.controller_resources, 60)
+        record_ids = set(StorageResourceRecord.objects.values_list('id', flat = True))
+
+        drive_resource = self.controller_resources[1]
+        drive_resource.capacity = 1024
+        self.resource_manager.session_open(self.plugin, self.couplet_resource_pk, self.controller_resources, 60)
+
+        self.assertSetEqual(set(StorageResourceRecord.objects.values_list('id', flat = True)), record_ids)
+        drive_record_id = self.resource_manager._sessions[self.couplet_resource_pk].local_id_to_global_id[drive_resource._handle]
+        capacity = StorageResourceAttributeSerialized.objects.get(resource = drive_record_id, key = 'capacity')
+        self.assertEqual(StorageResourceAttributeSerialized.decode(capacity.value), 1024)
+
     def test_global_remove(self):
         try:
             dbperf.enabled = True
@@ -0,0 +1,109 @@
+import threading
+
+from unittest import TestCase
+
+from chroma_core.services.plugin_runner.resource_manager import ScopeLocks
+
+
+class TestScopeLocks(TestCase):
+    def setUp(self):
+        self.locks = ScopeLocks()
+
+    def _run(self, fn):
+        thread = threading.Thread(target = fn)
+        thread.start()
+        return thread
+
+    def test_scopes_concurrent(self):
+        """Different scopes are held at the same time, the same scope is not"""
+        entered = threading.Event()
+        release = threading.Event()
+
+        def hold(scannable_id):
+            with self.locks.scope(scannable_id):
+                entered.set()
+                release.wait(5)
+
+        holder = self._run(lambda: hold(1))
+        self.assertTrue(entered.wait(5))
+
+        other = threading.Event()
+
+        def other_scope():
+            with self.locks.scope(2):
+                other.set()
+        self._run(other_scope).join(5)
+        self.assertTrue(other.is_set())
+
+        same = threading.Event()
+
+        def same_scope():
+            with self.locks.scope(1):
+                same.set()
+        thread = self._run(same_scope)
+        self.assertFalse(same.wait(0.1))
+
+        release.set()
+        holder.join(5)
+        thread.join(5)
+        self.assertTrue(same.is_set())
+
+    def test_exclusive(self):
+        """The exclusive lock waits for scopes, and scopes wait for it"""
+        entered = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            with self.locks.scope(1):
+                entered.set()
+                release.wait(5)
+
+        holder = self._run(hold)
+        self.assertTrue(entered.wait(5))
+
+        exclusive = threading.Event()
+        release_exclusive = threading.Event()
+
+        def take_exclusive():
+            with self.locks.exclusive():
+                exclusive.set()
+                release_exclusive.wait(5)
+        exclusive_thread = self._run(take_exclusive)
+        self.assertFalse(exclusive.wait(0.1))
+
+        # A waiting exclusive operation holds back new scope operations
+        scoped = threading.Event()
+
+        def other_scope():
+            with self.locks.scope(2):
+                scoped.set()
+        scoped_thread = self._run(other_scope)
+        self.assertFalse(scoped.wait(0.1))
+
+        release.set()
+        holder.join(5)
+        self.assertTrue(exclusive.wait(5))
+        self.assertFalse(scoped.wait(0.1))
+
+        release_exclusive.set()
+        exclusive_thread.join(5)
+        scoped_thread.join(5)
+        self.assertTrue(scoped.is_set())
+
+    def test_reentrant(self):
+        with self.locks.exclusive():
+            with self.locks.exclusive():
+                with self.locks.scope(1):
+                    with self.locks.scope(1):
+                        pass
+
+        with self.locks.scope(1):
+            with self.locks.scope(1):
+                pass
+            with self.assertRaises(RuntimeError):
+                with self.locks.exclusive():
+                    pass
+
+        # Everything was released
+        with self.locks.exclusive():
+            self.assertEqual(len(self.locks._shared), 0)
@@ -1,4 +1,5 @@
 import logging
+import threading
 
 from tests.unit.chroma_core.lib.storage_plugin.resource_manager.test_resource_manager import ResourceManagerTestCase
 
@@ -138,3 +139,31 @@ class TestAlerts(ResourceManagerTestCase):
 
         controller_resource.temperature = 1
         self.assertEqual(False, self._update_alerts_anytrue(self.resource_manager, resource_record.pk, controller_resource, LowerBoundCondition))
+
+
+class TestVirtualMachines(ResourceManagerTestCase):
+    def setUp(self):
+        super(TestVirtualMachines, self).setUp('virtual_machine_plugin')
+
+    def test_created_hosts_exclusive(self):
+        """Hosts of VirtualMachines reported by any scope are found or created under the exclusive lock"""
+        resource_record, controller_resource = self._make_global_resource('virtual_machine_plugin', 'Controller', {'address': 'foo'})
+        vm_resource = self._make_local_resource('virtual_machine_plugin', 'VirtualMachine', address = self.host.address)
+
+        exclusive = []
+        persist_created_hosts = self.resource_manager._persist_created_hosts
+
+        def check_exclusive(*args):
+            exclusive.append(self.resource_manager._locks._exclusive is threading.current_thread())
+            return persist_created_hosts(*args)
+        self.resource_manager._persist_created_hosts = check_exclusive
+
+        self.resource_manager.session_open(self.plugin, resource_record.pk, [controller_resource], 60)
+        self.assertEqual(exclusive, [])
+
+        self.resource_manager.session_add_resources(resource_record.pk, [vm_resource])
+        self.assertEqual(exclusive, [True])
+
+        from chroma_core.models import StorageResourceRecord
+        vm_record = StorageResourceRecord.objects.get(pk = self.resource_manager._sessions[resource_record.pk].local_id_to_global_id[vm_resource._handle])
+        self.assertEqual(vm_record.to_resource().host_id, self.host.id)
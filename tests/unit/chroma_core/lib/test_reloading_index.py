@@ -0,0 +1,55 @@
+from unittest import TestCase
+
+from chroma_core.lib.cache import ReloadingIndex
+
+
+class CountingIndex(ReloadingIndex):
+    def __init__(self, values):
+        super(CountingIndex, self).__init__()
+        self.values = values
+        self.loads = 0
+        self._values = {}
+
+    def _load(self):
+        self.loads += 1
+        self._values = dict(self.values)
+
+    def get(self, key):
+        return self._lookup('_values', key)
+
+
+class TestReloadingIndex(TestCase):
+    def setUp(self):
+        self.index = CountingIndex({'a': 1})
+
+    def test_found(self):
+        self.assertEqual(self.index.get('a'), 1)
+        self.assertEqual(self.index.get('a'), 1)
+        self.assertEqual(self.index.loads, 1)
+
+        # A new key is found by the reload its first miss causes
+        self.index.values['b'] = 2
+        self.assertEqual(self.index.get('b'), 2)
+        self.assertEqual(self.index.loads, 2)
+
+    def test_missed(self):
+        """Keys which missed are remembered across the reloads other misses cause"""
+        self.index.get('a')
+        for key in 'xy':
+            self.assertRaises(KeyError, self.index.get, key)
+        self.assertEqual(self.index.loads, 3)
+        for key in 'xyxy':
+            self.assertRaises(KeyError, self.index.get, key)
+        self.assertEqual(self.index.loads, 3)
+
+        # Until the periodic reload, which finds them if they have appeared
+        self.index.values['x'] = 3
+        self.index.expire()
+        self.assertEqual(self.index.get('x'), 3)
+        self.assertEqual(self.index.loads, 4)
+
+    def test_max_missed(self):
+        self.index.MAX_MISSED = 2
+        for key in 'xyz':
+            self.assertRaises(KeyError, self.index.get, key)
+        self.assertEqual(self.index._missed, set([('_values', 'z')]))
@@ -1,8 +1,12 @@
+import mock
+from django.db import connection
+
 from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
 
 from chroma_core.models import CommandRunningAlert
 from chroma_core.models import CommandCancelledAlert
 from chroma_core.models import AlertState
+from chroma_core.models.alert import ActiveAlertIndex, active_alerts
 
 
 class TestAlert(IMLUnitTestCase):
@@ -25,3 +29,48 @@ class TestAlert(IMLUnitTestCase):
         alerts = AlertState.objects.all()
         self.assertEqual(len(alerts), 1)
         self.assertEqual(alerts[0].message(), 'Command Houston we have a problem cancelled')
+
+    def test_active_alert_index(self):
+        command = self.make_command(message='Houston we have a problem')
+        connection.use_debug_cursor = True
+        try:
+            alert = CommandRunningAlert.notify(command, True)
+            queries = len(connection.queries)
+            raised = CommandRunningAlert.notify(command, True)
+            self.assertEqual(raised, alert)
+            self.assertIsNot(raised, CommandRunningAlert.notify(command, True))
+            # Each hit is only checked by id
+            self.assertEqual(len(connection.queries), queries + 2)
+        finally:
+            connection.use_debug_cursor = False
+
+        # An alert lowered behind the index's back is raised again without waiting for reconciliation
+        AlertState.objects.filter(id = alert.id).update(active = None)
+        raised = CommandRunningAlert.notify(command, True)
+        self.assertNotEqual(raised.id, alert.id)
+        self.assertTrue(AlertState.objects.get(id = raised.id).active)
+        CommandRunningAlert.notify(command, False)
+
+        # An alert raised behind the index's back is lowered without waiting for reconciliation
+        CommandRunningAlert.notify(command, False)
+        AlertState.objects.filter(id = alert.id).update(active = True)
+        CommandRunningAlert.notify(command, False)
+        self.assertFalse(AlertState.objects.get(id = alert.id).active)
+
+    def test_active_alert_index_reconcile(self):
+        """Saves made while a reconcile queries the database are not lost"""
+        index = ActiveAlertIndex()
+        raised = mock.Mock(id = 2, active = True, record_type = 'CommandRunningAlert',
+                           alert_item_type_id = 1, alert_item_id = 2)
+
+        def rows(*args):
+            # Another thread raises an alert once the query has run
+            index.saved(raised)
+            return [('CommandRunningAlert', 1, 1, 1)]
+
+        with mock.patch.object(AlertState, 'objects') as objects:
+            objects.filter.return_value.values_list.side_effect = rows
+            index.reconcile()
+
+        self.assertEqual(index.get(('CommandRunningAlert', 1, 1)), 1)
+        self.assertEqual(index.get(('CommandRunningAlert', 1, 2)), raised)
@@ -10,6 +10,7 @@ from django.db import connection
 from django.utils.unittest import skipIf
 
 from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+from tests.utils import patch
 from chroma_core.models import Point, Stats
 from chroma_core.models.stats import total_seconds
 from chroma_core.lib.util import chroma_settings
@@ -93,7 +94,7 @@ class TestModels(IMLUnitTestCase):
 
         model.objects.all().delete()
 
-        with assertQueries('INSERT', 'SELECT'):
+        with assertQueries('SELECT'):  # points are copied, not INSERTed
             model.insert({id: points})
             point = model.latest(id)
             model.cache.clear()
@@ -121,7 +122,7 @@ class TestModels(IMLUnitTestCase):
 
         model.objects.all().delete()
 
-        with assertQueries('INSERT', 'SELECT'):
+        with assertQueries('SELECT'):  # points are copied, not INSERTed
             model.insert({id: points})
             point = model.latest(id)
             model.cache.clear()
@@ -157,6 +158,23 @@ class TestModels(IMLUnitTestCase):
         self.assertListEqual(list(model.select(id)), [])
         self.assertTrue(Stats[-1].start(id))
 
+    def test_sample_partitions(self):
+        model = Stats[0]
+
+        with patch(model, partition_interval=3600, partition_tables=None):
+            model.insert({id: points})
+            starts = set(model.partition_start(point.dt) for point in points)
+            self.assertEqual(set(model.partitions()), starts)
+            model.partition_tables = None
+            self.assertEqual(set(model.partitions()), starts)
+            self.assertListEqual(list(model.select(id)), points)
+
+            model.drop(points[0].dt)
+            self.assertEqual(set(model.partitions()), starts)
+            model.drop(points[-1].dt + timedelta(seconds=3600))
+            self.assertEqual(model.partitions(), {})
+            self.assertListEqual(list(model.select(id)), [])
+
     def test_stats(self):
         outdated = Stats.insert((id, point.dt, point.sum) for point in points)
         self.assertEqual(outdated, [])
@@ -201,6 +219,43 @@ class TestModels(IMLUnitTestCase):
         for model in Stats:
             self.assertListEqual(list(model.select(id)), [])
 
+    def test_rollup(self):
+        "Verify partial aggregates restored from storage roll up identically to uninterrupted inserts."
+        samples = [(id, point.dt, point.sum) for point in points]
+        self.assertEqual(Stats.insert(samples), [])
+        expected = [list(model.select(id)) for model in Stats]
+        Stats.delete_all()
+        Stats.insert(samples[:len(samples) // 2])
+        Stats.reset([id])
+        self.assertNotIn(id, Stats.rollup.slots)
+        self.assertEqual(Stats.insert(samples[len(samples) // 2:]), [])
+        self.assertEqual([list(model.select(id)) for model in Stats], expected)
+        self.assertEqual(Stats.insert(samples[-1:]), samples[-1:])
+
+    def test_rollup_size(self):
+        "Verify series evicted from the rollup, and their slots reused, roll up identically."
+        samples = [(id, point.dt, point.sum) for point in points]
+        Stats.insert(samples)
+        expected = [list(model.select(id)) for model in Stats]
+        Stats.delete_all()
+        with patch(Stats.rollup, SIZE=1):
+            for sample in samples:
+                Stats.insert([sample])
+                Stats.insert([(id + 1,) + sample[1:]])
+            self.assertEqual(Stats.rollup.slots, {id + 1: 0})
+            self.assertEqual(len(Stats.rollup.ids), 1)
+        self.assertEqual([list(model.select(id)) for model in Stats], expected)
+
+    def test_select_many(self):
+        Stats.insert((id, point.dt, point.sum) for point in points)
+        Stats.insert((id + 1, point.dt, point.sum * 2) for point in points)
+        start, stop = points[0].dt, points[-1].dt
+        for kwargs in ({}, {'maxlen': 10}, {'fixed': 7}):
+            selection = Stats.select_many([id, id + 1], start, stop, rates=[id + 1], **kwargs)
+            self.assertEqual(selection[id], Stats.select(id, start, stop, **kwargs))
+            self.assertEqual(selection[id + 1], Stats.select(id + 1, start, stop, rate=True, **kwargs))
+        self.assertEqual(Stats.select_many([], start, stop), {})
+
 
 @skipIf(True, "Monster Data Tests Not Normally Run")
 class TestMonsterData(IMLUnitTestCase):
@@ -236,6 +291,7 @@ class TestMonsterData(IMLUnitTestCase):
 
                 dt.now.return_value = date
                 Stats.insert(data)
+                Stats.expire()
 
                 date += timedelta(seconds=10)
                 first_job_stat += 1
@@ -7,7 +7,7 @@ from django.contrib.auth.models import User
 from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
 from tests.utils import patch
 from chroma_core.lib import metrics
-from chroma_core.models.stats import Series, Stats, timestamp
+from chroma_core.models.stats import Cache, Series, Stats, timestamp
 
 
 fields = ('size', 'Gauge', 0, 1000), ('bandwith', 'Counter', 0, 100), ('speed', 'Derive', -100, 100)
@@ -42,6 +42,36 @@ class TestSeries(IMLUnitTestCase):
             self.assertEqual(series, Series.get(self.obj, field))
         self.assertFalse(Series.cache)
 
+    def test_resolve(self):
+        types = dict(field[:2] for field in fields)
+        ids = Series.resolve(self.obj, types)
+        self.assertEqual(ids, dict(Series.filter(self.obj).values_list('name', 'id')))
+        self.assertEqual(Series.resolve(self.obj, dict(types, missing='Gauge'))['size'], ids['size'])
+        counters = Series.cache_stats()['Series.index']
+        Series.resolve(self.obj, types)
+        self.assertEqual(Series.cache_stats()['Series.index']['hits'], counters['hits'] + len(types))
+        Series.index.clear()
+        Series.warm()
+        with self.assertNumQueries(0):
+            self.assertEqual(Series.resolve(self.obj, types), ids)
+
+    def test_cache(self):
+        cache = Cache(list, size=2)
+        cache['a'].append(1)
+        cache['b']
+        self.assertEqual(cache['a'], [1])
+        cache['c']
+        self.assertEqual(list(cache), ['a', 'c'])
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 3, 'evictions': 1, 'entries': 2, 'weight': 2})
+        cache = Cache(list, size=3, weigh=len)
+        cache['a'] += [1, 2]
+        cache['b'] += [1, 2]
+        self.assertEqual(list(cache), ['b'])
+        self.assertEqual(cache.weight, 2)
+        cache.discard('b')
+        cache.discard('c')
+        self.assertEqual((list(cache), cache.weight), ([], 0))
+
     def test_fast(self):
         "Small data set with short intervals."
         for data in zip(*[gen_series(5, 100)] * 10):
@@ -0,0 +1,60 @@
+import time
+
+from chroma_core.models import HostContactAlert
+from chroma_core.services.http_agent.host_state import HostState, HostStateCollection, HostStatePoller
+from chroma_core.services.http_agent.sessions import SessionCollection
+from tests.unit.chroma_core.helpers import synthetic_host, load_default_profile
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class TestHostStateCollection(IMLUnitTestCase):
+    "Test the contact timeouts of the http_agent host states."
+
+    def setUp(self):
+        super(TestHostStateCollection, self).setUp()
+
+        load_default_profile()
+        self.hosts = [synthetic_host(fqdn) for fqdn in ['host0', 'host1', 'host2']]
+        self.collection = HostStateCollection()
+        for host in self.hosts:
+            self.collection.update(host.fqdn)
+
+    def test_expire(self):
+        "Only the hosts whose deadline has passed expire, once each."
+        self.assertEqual(self.collection.unhealthy_fqdns(), set())
+        self.assertEqual(self.collection.expire(), [])
+
+        later = time.time() + HostState.CONTACT_TIMEOUT + 1
+        self.collection.update('host1')
+        dict(self.collection.items())['host1'].deadline = later + HostState.CONTACT_TIMEOUT
+
+        expired = self.collection.expire(later)
+        self.assertEqual(sorted(state.fqdn for state in expired), ['host0', 'host2'])
+        self.assertEqual(self.collection.unhealthy_fqdns(), set(['host0', 'host2']))
+        self.assertEqual(self.collection.expire(later), [])
+
+        # Contact restores health, and a new deadline
+        self.collection.update('host0')
+        self.assertEqual(self.collection.unhealthy_fqdns(), set(['host2']))
+        self.assertEqual(self.collection.expire(), [])
+
+    def test_poll(self):
+        "The poller raises a contact alert on each host which expires."
+        later = time.time() + HostState.CONTACT_TIMEOUT + 1
+
+        HostStatePoller(self.collection, SessionCollection(None)).poll(later)
+        for host in self.hosts:
+            self.assertEqual(HostContactAlert.filter_by_item(host).count(), 1)
+        self.assertEqual(self.collection.unhealthy_fqdns(), set(['host0', 'host1', 'host2']))
+
+    def test_contact_before_expiry(self):
+        "Contact after the deadline passed but before the poll keeps the host healthy."
+        later = time.time() + HostState.CONTACT_TIMEOUT + 1
+        state = dict(self.collection.items())['host0']
+        self.collection.update('host0')
+        state.deadline = later + HostState.CONTACT_TIMEOUT
+
+        expired = self.collection.expire(later)
+        self.assertEqual(sorted(state.fqdn for state in expired), ['host1', 'host2'])
+        self.assertEqual(HostContactAlert.filter_by_item(self.hosts[0]).count(), 0)
+        self.assertTrue(state.healthy)
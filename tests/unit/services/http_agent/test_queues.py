@@ -0,0 +1,28 @@
+import Queue
+import threading
+
+from chroma_core.services.http_agent.queues import HostTxQueue
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class TestHostTxQueue(IMLUnitTestCase):
+    "Test the per host queue of messages to agents."
+
+    def test_order(self):
+        queue = HostTxQueue()
+        for index in range(3):
+            queue.put({'type': 'DATA', 'index': index})
+        self.assertEqual([queue.get(block=False)['index'] for index in range(3)], [0, 1, 2])
+        self.assertRaises(Queue.Empty, queue.get, block=False)
+
+    def test_timeout(self):
+        queue = HostTxQueue()
+        self.assertRaises(Queue.Empty, queue.get, block=True, timeout=0.1)
+
+    def test_wakeup(self):
+        queue = HostTxQueue()
+        timer = threading.Timer(0.1, queue.put, [{'type': 'TX_BARRIER'}])
+        timer.start()
+        self.assertEqual(queue.get(block=True, timeout=10), {'type': 'TX_BARRIER'})
+        timer.join()
+        self.assertEqual(queue.qsize(), 0)
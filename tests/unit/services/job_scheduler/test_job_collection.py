@@ -0,0 +1,92 @@
+import json
+
+import mock
+
+from chroma_core.services.job_scheduler.job_scheduler import JobCollection
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class TestJobCollection(IMLUnitTestCase):
+    "Test the tracking of pending jobs as waiting or ready."
+
+    def setUp(self):
+        super(TestJobCollection, self).setUp()
+
+        mock.patch('chroma_core.services.job_scheduler.job_scheduler.Job').start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.collection = JobCollection()
+
+    def _job(self, job_id, wait_for = (), state = 'pending'):
+        job = mock.Mock(id = job_id, state = state, errored = False, cancelled = False,
+                        wait_for_json = json.dumps(list(wait_for)))
+        self.collection.add(job)
+        return job
+
+    def _ready_ids(self):
+        return [job.id for job in self.collection.ready_jobs]
+
+    def test_complete(self):
+        """A job becomes ready once every job it waits for completes"""
+        first = self._job(1)
+        second = self._job(2)
+        third = self._job(3, wait_for = [1, 2])
+        self.assertEqual(self._ready_ids(), [1, 2])
+
+        self.collection.update_many([first, second], 'tasked')
+        self.assertEqual(self._ready_ids(), [])
+
+        self.collection.update(first, 'complete')
+        self.assertEqual(self._ready_ids(), [])
+
+        self.collection.update(second, 'complete')
+        self.assertEqual(self._ready_ids(), [3])
+
+        self.collection.update(third, 'tasked')
+        self.assertEqual(self._ready_ids(), [])
+        self.assertEqual(list(self.collection.tasked_jobs), [third])
+
+    def test_cancelled(self):
+        """A cancelled job releases its waiters, and a cancelled waiter is no longer ready"""
+        first = self._job(1)
+        second = self._job(2, wait_for = [1])
+        third = self._job(3, wait_for = [2])
+
+        self.collection.update(first, 'complete', cancelled = True)
+        self.assertEqual(self._ready_ids(), [2])
+        self.assertTrue(first.cancelled)
+
+        self.collection.update(second, 'complete', cancelled = True)
+        self.assertEqual(self._ready_ids(), [3])
+
+        self.collection.update(third, 'complete', cancelled = True)
+        self.assertEqual(self._ready_ids(), [])
+        self.assertEqual(list(self.collection.pending_jobs), [])
+
+    def test_errored(self):
+        """A failed job releases its waiters"""
+        first = self._job(1, state = 'tasked')
+        second = self._job(2, wait_for = [1])
+        self.assertEqual(self._ready_ids(), [])
+
+        self.collection.update(first, 'complete', errored = True)
+        self.assertEqual(self._ready_ids(), [2])
+        self.assertTrue(first.errored)
+
+        # Completing it again does not disturb the waiter
+        self.collection.update(first, 'complete', errored = True)
+        self.assertEqual(self._ready_ids(), [2])
+
+    def test_already_complete(self):
+        """A job added after the jobs it waits for complete is ready at once"""
+        first = self._job(1, state = 'tasked')
+        second = self._job(2, wait_for = [1])
+        self.collection.update(first, 'complete')
+        self.assertEqual(self._ready_ids(), [2])
+
+        third = self._job(3, wait_for = [1, 2])
+        self.assertEqual(self._ready_ids(), [2])
+
+        self.collection.update(second, 'complete')
+        self.assertEqual(self._ready_ids(), [3])
+        self.assertIs(self.collection.get(3), third)
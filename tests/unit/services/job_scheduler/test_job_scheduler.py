@@ -147,6 +147,26 @@ class TestStateManager(JobTestCaseWithHost):
         job_scheduler_notify.notify(freshen(self.lnet_configuration), awhile_ago, {'state': 'lnet_down'}, ['lnet_up'])
         self.assertEqual(freshen(self.lnet_configuration).state, 'lnet_up')
 
+    def test_coalesced_notifications(self):
+        """Test that a batch of notifications is applied with one scheduling pass, and that of
+        notifications of the same attributes of an object only the latest is applied"""
+        from chroma_core.services.job_scheduler import QueueHandler
+        from chroma_core.services.job_scheduler.job_scheduler_notify import NotificationQueue
+
+        messages = []
+        earlier = django.utils.timezone.now()
+        later = earlier + datetime.timedelta(seconds = 1)
+        with mock.patch.object(NotificationQueue, 'put', mock.Mock(side_effect = messages.append)):
+            job_scheduler_notify.notify(freshen(self.host), later, {'boot_time': later})
+            job_scheduler_notify.notify(freshen(self.host), earlier, {'boot_time': earlier})
+
+        with mock.patch.object(self.job_scheduler, '_notify', wraps = self.job_scheduler._notify) as _notify:
+            with mock.patch.object(self.job_scheduler, '_run_next') as _run_next:
+                QueueHandler(self.job_scheduler).on_messages(messages)
+        self.assertEqual(_notify.call_count, 1)
+        self.assertEqual(_run_next.call_count, 1)
+        self.assertEqual(freshen(self.host).boot_time, later)
+
     def test_buffered_notification(self):
         """Test that notifications for locked items are buffered and
         replayed when the locking Job has completed."""
@@ -0,0 +1,31 @@
+import mock
+
+from chroma_core.services.job_scheduler.lock_cache import LocksByJob
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class TestLocksByJob(IMLUnitTestCase):
+    "Test the job ordered lists of locks on an item."
+
+    def _lock(self, job_id):
+        return mock.Mock(job = mock.Mock(id = job_id))
+
+    def test_order(self):
+        locks = LocksByJob()
+        first, second, third, fourth = [self._lock(job_id) for job_id in (2, 1, 3, 2)]
+        for lock in (first, second, third, fourth):
+            locks.add(lock)
+        self.assertEqual(list(locks), [second, first, fourth, third])
+        self.assertEqual(locks.after(2), [first, fourth, third])
+        self.assertEqual(locks[-1], third)
+
+    def test_discard(self):
+        locks = LocksByJob()
+        first, second = self._lock(1), self._lock(1)
+        locks.add(first)
+        locks.add(second)
+        locks.discard(first)
+        self.assertEqual(list(locks), [second])
+        self.assertEqual(locks.job_ids, [1])
+        locks.discard(first)
+        self.assertEqual(list(locks), [second])
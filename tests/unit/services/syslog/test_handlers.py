@@ -1,4 +1,5 @@
 from chroma_core.services.syslog.parser import admin_client_eviction_handler, client_connection_handler, server_security_flavor_handler, client_eviction_handler
+from chroma_core.services.syslog.parser import LogMessageParser
 from chroma_core.models.event import ClientConnectEvent
 from tests.unit.chroma_core.helpers import synthetic_host
 from tests.unit.chroma_core.helpers import load_default_profile
@@ -57,7 +58,13 @@ class TestHandlers(IMLUnitTestCase):
         for example in ssfh_examples:
             server_security_flavor_handler(example['message'], None)
 
-        # TODO: test doing a client connection and then one of these, to see it get correlated
+    def test_server_security_flavor_correlation(self):
+        connection = examples[client_connection_handler][0]
+        client_connection_handler(connection['message'], self.host)
+        server_security_flavor_handler(" Lustre: 5629:0:(sec.c:1474:sptlrpc_import_sec_adapt()) import lustre-MDT0000->NET_0x20000c0a87ada_UUID netid 20000: select flavor null", None)
+        event = ClientConnectEvent.objects.latest('id')
+        self.assertEqual(event.lustre_pid, connection['lustre_pid'])
+        self.assertTrue(event.message_str.endswith(" with security flavor null"))
 
     def test_client_connection_handler(self):
         for example in examples[client_connection_handler]:
@@ -76,3 +83,19 @@ class TestHandlers(IMLUnitTestCase):
             client_eviction_handler(example['message'], self.host)
             event = ClientConnectEvent.objects.latest('id')
             self.assertEqual(event.lustre_pid, example['lustre_pid'])
+
+    def test_parse_many(self):
+        def failing_handler(message, host):
+            raise RuntimeError(message)
+
+        parser = LogMessageParser()
+        hits = []
+        for example in examples[client_connection_handler]:
+            hits.append(('myaddress', {'message': example['message']}, client_connection_handler))
+        hits.insert(1, ('myaddress', {'message': "bad line"}, failing_handler))
+        hits.append(('unknown-host', {'message': examples[client_connection_handler][0]['message']}, client_connection_handler))
+
+        before = ClientConnectEvent.objects.count()
+        parser.parse_many(hits)
+        self.assertEqual(ClientConnectEvent.objects.count(), before + len(examples[client_connection_handler]))
+        self.assertEqual(ClientConnectEvent.objects.latest('id').lustre_pid, examples[client_connection_handler][-1]['lustre_pid'])
@@ -0,0 +1,71 @@
+from chroma_core.services.lustre_audit import AuditDispatcher
+from chroma_core.services.lustre_audit.update_scan import TargetIndex
+from tests.unit.chroma_core.helpers import synthetic_host
+from tests.unit.chroma_core.helpers import load_default_profile
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class TestAuditDispatcher(IMLUnitTestCase):
+    "Test the handing of host reports to lustre_audit workers."
+
+    def test_superseded(self):
+        processed = []
+        dispatcher = AuditDispatcher(lambda fqdn, data: processed.append((fqdn, data)))
+        dispatcher.put('a', 1)
+        dispatcher.put('b', 1)
+        dispatcher.put('a', 2)
+        # One report per host is left;  further calls find nothing ready
+        for i in range(3):
+            dispatcher.process(timeout = 0)
+        self.assertEqual(processed, [('a', 2), ('b', 1)])
+        self.assertEqual(dispatcher.dropped, 1)
+        self.assertEqual(sorted(dispatcher.status()['lags']), ['a', 'b'])
+
+    def test_busy(self):
+        processed = []
+
+        def callback(fqdn, data):
+            # A newer report arriving while one is processed waits for it to complete
+            if data == 1:
+                dispatcher.put(fqdn, 2)
+                self.assertEqual(dispatcher._ready.qsize(), 0)
+            processed.append(data)
+
+        dispatcher = AuditDispatcher(callback)
+        dispatcher.put('a', 1)
+        dispatcher.process(timeout = 0)
+        dispatcher.process(timeout = 0)
+        self.assertEqual(processed, [1, 2])
+        self.assertEqual(dispatcher.status()['waiting'], {})
+
+
+class TestTargetIndex(IMLUnitTestCase):
+    "Test resolving reported resource locations without a query each."
+
+    def setUp(self):
+        super(TestTargetIndex, self).setUp()
+
+        load_default_profile()
+        self.host = synthetic_host('myaddress', fqdn = 'myaddress.tld', nodename = 'mynode')
+        self.index = TargetIndex()
+
+    def test_host(self):
+        with self.assertNumQueries(3):
+            self.assertEqual(self.index.host('mynode'), self.host.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.index.host('myaddress.tld'), self.host.id)
+
+        # A host created since the last load is found by reloading
+        other = synthetic_host('otheraddress')
+        with self.assertNumQueries(3):
+            self.assertEqual(self.index.host('otheraddress'), other.id)
+
+    def test_not_targets(self):
+        """Resources which are not targets each cause one reload, however many a host reports"""
+        self.index.reload()
+        for resource_name in ['st-fencing', 'st-other']:
+            with self.assertNumQueries(3):
+                self.assertRaises(KeyError, self.index.target, resource_name)
+        with self.assertNumQueries(0):
+            for resource_name in ['st-fencing', 'st-other'] * 2:
+                self.assertRaises(KeyError, self.index.target, resource_name)
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+from django.test import TransactionTestCase
+from django.utils.timezone import utc
+
+from chroma_core.models import Point, Stats
+from chroma_core.services.stats import Service, encode, decode, FRAME_HEADER
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+
+class TestStatsFrames(IMLUnitTestCase):
+    "Test the binary wire format of the stats queue."
+
+    def test_round_trip(self):
+        now = datetime(2018, 10, 1, 12, 0, 0, 250000, tzinfo=utc)
+        samples = [(1, now, 1.5), (2, now + timedelta(seconds=10), 2), (2 ** 32 - 1, now, -3.25)]
+        frame = encode(samples)
+        self.assertEqual(len(frame), FRAME_HEADER.size + len(samples) * (4 + 8 + 8))
+        ids, timestamps, values = decode(frame)
+        self.assertEqual(list(ids), [1, 2, 2 ** 32 - 1])
+        self.assertEqual(list(values), [1.5, 2.0, -3.25])
+        epoch = datetime.fromtimestamp(0, utc)
+        self.assertEqual([epoch + timedelta(seconds=ts) for ts in timestamps], [sample[1] for sample in samples])
+        self.assertEqual(map(list, decode(encode([]))), [[], [], []])
+
+    def test_invalid(self):
+        frame = encode([])
+        self.assertRaises(ValueError, decode, 'XXXX' + frame[4:])
+        self.assertRaises(ValueError, decode, FRAME_HEADER.pack('IMLS', 2, 0))
+
+
+class TestStatsInsert(TransactionTestCase):
+    "Test the stats service recovers from failed inserts;  rollbacks are real, so not an IMLUnitTestCase."
+
+    def setUp(self):
+        Stats.delete_all()
+
+    def tearDown(self):
+        Stats.delete_all()
+
+    def test_duplicate(self):
+        service = Service()
+        model = Stats[0]
+        now = datetime.now(utc).replace(microsecond=0)
+        dts = [now + timedelta(seconds=model.step * n) for n in range(3)]
+        service.insert([(1, str(dts[0]), 1.0)])
+
+        # stored behind the rollup's back, so the next batch duplicates it
+        model.copy([(1, Point(dts[1], 2.0, 1))])
+        service.insert([(1, str(dts[1]), 2.0)])
+        self.assertNotIn(1, Stats.rollup.slots)
+
+        service.insert([(1, str(dts[2]), 3.0)])
+        self.assertEqual(list(model.select(1)), [Point(dts[0], 1.0, 1), Point(dts[1], 2.0, 1), Point(dts[2], 3.0, 1)])